@@ -27,6 +27,12 @@ requires = [
     'yfinance'
 ]
 
+extras = {
+    'lz4': ['lz4'],
+    'parquet': ['pyarrow>=1.0'],
+    'zstd': ['zstandard']
+}
+
 setuptools.setup(
     name='serenity-trading',
     version='0.3.0',
@@ -43,6 +49,7 @@ setuptools.setup(
     include_package_data=True,
     python_requires='>=3.7.x',
     install_requires=requires,
+    extras_require=extras,
     classifiers=(
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
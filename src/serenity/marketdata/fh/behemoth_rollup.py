@@ -0,0 +1,35 @@
+import datetime
+import logging
+from pathlib import Path
+from typing import Optional
+
+import fire
+
+from serenity.tickstore.rollup import ROLLUP_FREQUENCIES, Rollup, get_rollup_db
+from serenity.tickstore.tickstore import LocalTickstore
+from serenity.utils import init_logging
+
+
+def rollup_main(behemoth_path: str = '/behemoth', days_back: Optional[int] = None,
+                frequencies: tuple = tuple(ROLLUP_FREQUENCIES.keys())):
+    init_logging()
+    logger = logging.getLogger(__name__)
+    start_date = None
+    if days_back is not None:
+        start_date = datetime.datetime.utcnow().date() - datetime.timedelta(days_back)
+
+    # bars for every trade tickstore go into sibling tickstores, e.g. PHEMEX_TRADES_OHLCV_1M
+    for db in ['PHEMEX_TRADES', 'COINBASE_PRO_TRADES']:
+        source = LocalTickstore(Path(f'{behemoth_path}/db/{db}'), 'time')
+        targets = {frequency: LocalTickstore(Path(f'{behemoth_path}/db/{get_rollup_db(db, frequency)}'), 'time')
+                   for frequency in frequencies}
+        updated = Rollup(source, targets).run(start_date=start_date)
+        logger.info(f'updated {updated} {db} rollups')
+
+        for target in targets.values():
+            target.close()
+        source.close()
+
+
+if __name__ == '__main__':
+    fire.Fire(rollup_main)
@@ -1,18 +1,24 @@
 import datetime
 import logging
 from pathlib import Path
+from typing import Optional
 
 import fire
+from dateutil.tz import tzlocal
+import numpy as np
 import pandas as pd
 
 from serenity.db import connect_serenity_db, InstrumentCache, TypeCodeCache
+from serenity.marketdata.fh.feedhandler import TRADE_RECORD_SCHEMA, MULTIPLEXED_TRADE_RECORD_SCHEMA, \
+    MULTIPLEXED_JOURNAL_NAME
 from serenity.tickstore.journal import Journal, NoSuchJournalException
 from serenity.tickstore.tickstore import LocalTickstore, BiTimestamp
 from serenity.utils import init_logging
 
 
 # noinspection DuplicatedCode
-def upload_main(behemoth_path: str = '/behemoth', days_back: int = 1):
+def upload_main(behemoth_path: str = '/behemoth', days_back: int = 1, splay_format: str = 'hdf5',
+                exchange: Optional[str] = None):
     init_logging()
     logger = logging.getLogger(__name__)
     upload_date = datetime.datetime.utcnow().date() - datetime.timedelta(days_back)
@@ -26,50 +32,61 @@ def upload_main(behemoth_path: str = '/behemoth', days_back: int = 1):
         'Phemex': 'PHEMEX_TRADES',
         'CoinbasePro': 'COINBASE_PRO_TRADES'
     }
+    if exchange is not None:
+        # tickstore writers lock the index, so one upload job per exchange can run in parallel
+        exchanges = {exchange: exchanges[exchange]}
     for exchange, db in exchanges.items():
+        # a feedhandler running in multiplexed mode journals all of its instruments together,
+        # so read that journal once and split it up by exchange instrument ID
+        multiplexed_trades = None
+        multiplexed_path = Path(f'{behemoth_path}/journals/{db}/{MULTIPLEXED_JOURNAL_NAME}')
+        if multiplexed_path.exists():
+            try:
+                reader = Journal(multiplexed_path).create_reader(upload_date)
+                multiplexed_trades = reader.demultiplex(MULTIPLEXED_TRADE_RECORD_SCHEMA)
+                reader.close()
+            except NoSuchJournalException:
+                logger.info(f'no multiplexed journal file for UTC date {str(upload_date)}: {multiplexed_path}')
+
         for instrument in instr_cache.get_all_exchange_instruments(exchange):
             symbol = instrument.get_exchange_instrument_code()
             path = Path(f'{behemoth_path}/journals/{db}/{symbol}')
-            journal = Journal(path)
 
             try:
-                reader = journal.create_reader(upload_date)
-
-                length = reader.get_length()
-                records = []
-                while reader.get_pos() < length:
-                    time = reader.read_double()
-                    sequence = reader.read_long()
-                    trade_id = reader.read_long()
-                    product_id = reader.read_string()
-                    side = 'buy' if reader.read_short() == 0 else 'sell'
-                    size = reader.read_double()
-                    price = reader.read_double()
+                if multiplexed_trades is not None:
+                    trades = multiplexed_trades.get(instrument.get_exchange_instrument_id(), [])
+                    product_id = symbol
+                else:
+                    journal = Journal(path)
+                    reader = journal.create_reader(upload_date)
 
-                    record = {
-                        'time': datetime.datetime.fromtimestamp(time),
-                        'sequence': sequence,
-                        'trade_id': trade_id,
-                        'product_id': product_id,
-                        'side': side,
-                        'size': size,
-                        'price': price
-                    }
-                    records.append(record)
+                    trades = reader.read_all(TRADE_RECORD_SCHEMA)
+                    reader.close()
+                    product_id = np.char.decode(trades['product_id'])
 
-                if len(records) > 0:
+                if len(trades) > 0:
                     logger.info(f'uploading journaled {exchange}/{symbol} ticks to Behemoth for UTC date {str(upload_date)}')
-                    df = pd.DataFrame(records)
+                    # same naive local times as datetime.fromtimestamp(), which earlier uploads stored
+                    times = pd.to_datetime(trades['time'], unit='s', utc=True).round('us')
+                    df = pd.DataFrame({
+                        'time': times.tz_convert(tzlocal()).tz_localize(None),
+                        'sequence': trades['sequence'],
+                        'trade_id': trades['trade_id'],
+                        'product_id': product_id,
+                        'side': np.where(trades['side'] == 0, 'buy', 'sell'),
+                        'size': trades['size'],
+                        'price': trades['price']
+                    })
                     df.set_index('time', inplace=True)
                     logger.info(f'extracted {len(df)} {symbol} trade records')
-                    tickstore = LocalTickstore(Path(Path(f'{behemoth_path}/db/{db}')), 'time')
+                    tickstore = LocalTickstore(Path(Path(f'{behemoth_path}/db/{db}')), 'time', splay_format)
                     tickstore.insert(symbol, BiTimestamp(upload_date), df)
                     tickstore.close()
 
                     logger.info(f'inserted {len(df)} {symbol} records')
                 else:
                     logger.info(f'zero {exchange}/{symbol} ticks for UTC date {str(upload_date)}')
-                    tickstore = LocalTickstore(Path(Path(f'{behemoth_path}/db/{db}')), 'time')
+                    tickstore = LocalTickstore(Path(Path(f'{behemoth_path}/db/{db}')), 'time', splay_format)
                     tickstore.close()
             except NoSuchJournalException:
                 logger.error(f'missing journal file: {path}')
@@ -1,7 +1,7 @@
 import asyncio
 import logging
 from abc import ABC, abstractmethod
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum, auto
 from pathlib import Path
 from typing import List
@@ -14,10 +14,37 @@ from serenity.db import TypeCodeCache, InstrumentCache, connect_serenity_db
 from serenity.marketdata import MarketdataService, OrderBook, OrderBookSnapshot
 from serenity.model.exchange import ExchangeInstrument
 from serenity.model.order import Side
-from serenity.tickstore.journal import Journal
+from serenity.tickstore.journal import Journal, RecordSchema
 from serenity.utils import init_logging, custom_asyncio_error_handler
 
 
+# layout of the trade prints journaled by ws_fh_main, which behemoth_upload decodes in bulk
+TRADE_RECORD_SCHEMA = RecordSchema('trade', [
+    ('time', 'double'),
+    ('sequence', 'long'),
+    ('trade_id', 'long'),
+    ('product_id', 'string'),
+    ('side', 'short'),
+    ('size', 'double'),
+    ('price', 'double')
+], timestamp_field='time')
+
+# layout of the trade prints journaled by ws_fh_main in multiplexed mode, where all of a feedhandler's
+# instruments share a single journal and each record carries the exchange instrument ID instead
+MULTIPLEXED_TRADE_RECORD_SCHEMA = RecordSchema('trade', [
+    ('time', 'double'),
+    ('instrument_id', 'int'),
+    ('sequence', 'long'),
+    ('trade_id', 'long'),
+    ('side', 'short'),
+    ('size', 'double'),
+    ('price', 'double')
+], timestamp_field='time', key_field='instrument_id')
+
+# name of the shared journal, next to the per-instrument journals, used in multiplexed mode
+MULTIPLEXED_JOURNAL_NAME = '_ALL'
+
+
 class FeedHandlerState(Enum):
     """
     Supported lifecycle states for a FeedHandler. FeedHandlers always start in INITIALIZING state.
@@ -255,7 +282,7 @@ class FeedHandlerMarketdataService(MarketdataService):
         return f'{instrument.get_exchange().get_type_code().lower()}:{self.instance_id}:{symbol}'
 
 
-def ws_fh_main(create_fh, uri_scheme: str, instance_id: str, journal_path: str, db: str):
+def ws_fh_main(create_fh, uri_scheme: str, instance_id: str, journal_path: str, db: str, multiplexed: bool = False):
     init_logging()
     logger = logging.getLogger(__name__)
 
@@ -270,6 +297,13 @@ def ws_fh_main(create_fh, uri_scheme: str, instance_id: str, journal_path: str,
     fh = create_fh(scheduler, instr_cache, instance_id)
     registry.register(fh)
 
+    # in multiplexed mode every instrument appends to one journal instead of opening its own
+    shared_appender = None
+    if multiplexed:
+        journal = Journal(Path(f'{journal_path}/{db}/{MULTIPLEXED_JOURNAL_NAME}'), precreate_lead=timedelta(minutes=5))
+        journal.register_schema(MULTIPLEXED_TRADE_RECORD_SCHEMA)
+        shared_appender = journal.create_appender()
+
     for instrument in fh.get_instruments():
         symbol = instrument.get_exchange_instrument_code()
 
@@ -282,9 +316,14 @@ def ws_fh_main(create_fh, uri_scheme: str, instance_id: str, journal_path: str,
             def on_activate(self) -> bool:
                 if fh.get_state().get_value() == FeedHandlerState.LIVE:
                     feed = registry.get_feed(f'{uri_scheme}:{instance_id}:{self.trade_symbol}')
-                    instrument_code = feed.get_instrument().get_exchange_instrument_code()
-                    journal = Journal(Path(f'{journal_path}/{db}/{instrument_code}'))
-                    self.appender = journal.create_appender()
+                    if multiplexed:
+                        self.appender = shared_appender
+                    else:
+                        instrument_code = feed.get_instrument().get_exchange_instrument_code()
+                        journal = Journal(Path(f'{journal_path}/{db}/{instrument_code}'),
+                                          precreate_lead=timedelta(minutes=5))
+                        journal.register_schema(TRADE_RECORD_SCHEMA)
+                        self.appender = journal.create_appender()
 
                     trades = feed.get_trades()
                     Do(scheduler.get_network(), trades, lambda: self.on_trade_print(trades.get_value()))
@@ -293,13 +332,24 @@ def ws_fh_main(create_fh, uri_scheme: str, instance_id: str, journal_path: str,
             def on_trade_print(self, trade):
                 logger.info(trade)
 
-                self.appender.write_double(datetime.utcnow().timestamp())
-                self.appender.write_long(trade.get_trade_id())
-                self.appender.write_long(trade.get_trade_id())
-                self.appender.write_string(trade.get_instrument().get_exchange_instrument_code())
-                self.appender.write_short(1 if trade.get_side().get_type_code() == 'Buy' else 0)
-                self.appender.write_double(trade.get_qty())
-                self.appender.write_double(trade.get_price())
+                if multiplexed:
+                    self.appender.append_record('trade',
+                                                datetime.utcnow().timestamp(),
+                                                trade.get_instrument().get_exchange_instrument_id(),
+                                                trade.get_trade_id(),
+                                                trade.get_trade_id(),
+                                                1 if trade.get_side().get_type_code() == 'Buy' else 0,
+                                                trade.get_qty(),
+                                                trade.get_price())
+                else:
+                    self.appender.append_record('trade',
+                                                datetime.utcnow().timestamp(),
+                                                trade.get_trade_id(),
+                                                trade.get_trade_id(),
+                                                trade.get_instrument().get_exchange_instrument_code(),
+                                                1 if trade.get_side().get_type_code() == 'Buy' else 0,
+                                                trade.get_qty(),
+                                                trade.get_price())
 
         scheduler.get_network().connect(fh.get_state(), SubscribeTrades(symbol))
 
@@ -208,8 +208,8 @@ def create_fh(scheduler: NetworkScheduler, instrument_cache: InstrumentCache, in
     return PhemexFeedHandler(scheduler, instrument_cache, instance_id)
 
 
-def main(instance_id: str = 'prod', journal_path: str = '/behemoth/journals/'):
-    ws_fh_main(create_fh, PhemexFeedHandler.get_uri_scheme(), instance_id, journal_path, 'PHEMEX_TRADES')
+def main(instance_id: str = 'prod', journal_path: str = '/behemoth/journals/', multiplexed: bool = False):
+    ws_fh_main(create_fh, PhemexFeedHandler.get_uri_scheme(), instance_id, journal_path, 'PHEMEX_TRADES', multiplexed)
 
 
 if __name__ == '__main__':
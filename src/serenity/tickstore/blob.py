@@ -0,0 +1,246 @@
+import base64
+import datetime
+import os
+import shutil
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+DEFAULT_TRANSFER_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+DEFAULT_TRANSFER_WORKERS = 8
+
+
+class BlobContainer(ABC):
+    """
+    The subset of a blob storage container's API the tickstore needs: blobs are uploaded as a list of blocks
+    which can be staged in parallel and then committed in one go, and can be read back by byte range.
+    """
+
+    @abstractmethod
+    def stage_block(self, name: str, block_id: str, data: bytes):
+        """
+        Uploads one block of a blob; it does not become part of the blob until committed.
+        """
+        pass
+
+    @abstractmethod
+    def commit_block_list(self, name: str, block_ids: List[str]):
+        """
+        Atomically creates or replaces the blob with the concatenation of the given staged blocks.
+        """
+        pass
+
+    @abstractmethod
+    def download_range(self, name: str, offset: int, length: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def get_blob_size(self, name: str) -> Optional[int]:
+        """
+        Gets the size of the blob in bytes, or None if there is no such blob.
+        """
+        pass
+
+    @abstractmethod
+    def list_blobs(self, prefix: str = '') -> List[str]:
+        pass
+
+    @abstractmethod
+    def list_blobs_modified(self, prefix: str = '') -> List[Tuple[str, datetime.datetime]]:
+        """
+        Lists the blobs along with the naive UTC times they were last modified, i.e. committed.
+        """
+        pass
+
+    @abstractmethod
+    def delete_blob(self, name: str):
+        pass
+
+
+class AzureBlobContainer(BlobContainer):
+    """
+    A container in Microsoft's Azure Blob Storage; requires the optional azure-storage-blob dependency.
+    """
+
+    def __init__(self, connection_string: str, container_name: str):
+        from azure.storage.blob import ContainerClient
+
+        self.container_client = ContainerClient.from_connection_string(connection_string, container_name)
+
+    def stage_block(self, name: str, block_id: str, data: bytes):
+        self.container_client.get_blob_client(name).stage_block(block_id, data)
+
+    def commit_block_list(self, name: str, block_ids: List[str]):
+        from azure.storage.blob import BlobBlock
+
+        self.container_client.get_blob_client(name).commit_block_list([BlobBlock(block_id=block_id)
+                                                                       for block_id in block_ids])
+
+    def download_range(self, name: str, offset: int, length: int) -> bytes:
+        return self.container_client.download_blob(name, offset=offset, length=length).readall()
+
+    def get_blob_size(self, name: str) -> Optional[int]:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return self.container_client.get_blob_client(name).get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
+    def list_blobs(self, prefix: str = '') -> List[str]:
+        return [blob.name for blob in self.container_client.list_blobs(name_starts_with=prefix)]
+
+    def list_blobs_modified(self, prefix: str = '') -> List[Tuple[str, datetime.datetime]]:
+        return [(blob.name, blob.last_modified.astimezone(datetime.timezone.utc).replace(tzinfo=None))
+                for blob in self.container_client.list_blobs(name_starts_with=prefix)]
+
+    def delete_blob(self, name: str):
+        self.container_client.delete_blob(name)
+
+
+class DirectoryBlobContainer(BlobContainer):
+    """
+    Emulates a blob container with a local directory, one file per blob, for testing and for running the remote
+    tier against e.g. a network mount. Staged blocks are kept in a hidden directory until committed.
+    """
+
+    staging_dir = '.blocks'
+
+    def __init__(self, base_path: Path):
+        self.base_path = base_path.resolve()
+        self.base_path.joinpath(self.staging_dir).mkdir(parents=True, exist_ok=True)
+
+    def stage_block(self, name: str, block_id: str, data: bytes):
+        self._get_block_path(name, block_id).write_bytes(data)
+
+    def commit_block_list(self, name: str, block_ids: List[str]):
+        blob_path = self._get_blob_path(name)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._get_block_path(name, 'commit')
+        with tmp_path.open(mode='wb') as blob_file:
+            for block_id in block_ids:
+                with self._get_block_path(name, block_id).open(mode='rb') as block_file:
+                    shutil.copyfileobj(block_file, blob_file)
+        os.replace(str(tmp_path), str(blob_path))
+        for block_id in block_ids:
+            self._get_block_path(name, block_id).unlink()
+
+    def download_range(self, name: str, offset: int, length: int) -> bytes:
+        with self._get_blob_path(name).open(mode='rb') as blob_file:
+            blob_file.seek(offset)
+            return blob_file.read(length)
+
+    def get_blob_size(self, name: str) -> Optional[int]:
+        blob_path = self._get_blob_path(name)
+        return blob_path.stat().st_size if blob_path.is_file() else None
+
+    def list_blobs(self, prefix: str = '') -> List[str]:
+        names = []
+        for dir_path, dir_names, file_names in os.walk(str(self.base_path)):
+            if dir_path == str(self.base_path):
+                dir_names[:] = [dir_name for dir_name in dir_names if dir_name != self.staging_dir]
+            for file_name in file_names:
+                name = Path(dir_path).joinpath(file_name).relative_to(self.base_path).as_posix()
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+    def list_blobs_modified(self, prefix: str = '') -> List[Tuple[str, datetime.datetime]]:
+        return [(name, datetime.datetime.utcfromtimestamp(self._get_blob_path(name).stat().st_mtime))
+                for name in self.list_blobs(prefix)]
+
+    def delete_blob(self, name: str):
+        self._get_blob_path(name).unlink()
+
+    def _get_blob_path(self, name: str) -> Path:
+        return self.base_path.joinpath(name)
+
+    def _get_block_path(self, name: str, block_id: str) -> Path:
+        return self.base_path.joinpath(self.staging_dir, f'{name.replace("/", "_")}.{block_id.encode().hex()}')
+
+
+class BlobTransfer:
+    """
+    Moves files to and from a blob container in fixed-size chunks on a pool of threads. Batches of files are
+    transferred together, so a batch of small splays gets as much concurrency as one large file and the cost of
+    the round trips to the container is paid in parallel rather than once per file.
+    """
+
+    def __init__(self, container: BlobContainer, chunk_size: int = DEFAULT_TRANSFER_CHUNK_SIZE,
+                 workers: int = DEFAULT_TRANSFER_WORKERS):
+        self.container = container
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='blob-transfer')
+
+    def upload(self, files: List[Tuple[Path, str]]):
+        """
+        Uploads every (local path, blob name) pair, replacing any existing blobs.
+        """
+        staged = []
+        for path, name in files:
+            size = path.stat().st_size
+            offsets = range(0, size, self.chunk_size) if size > 0 else [0]
+            block_ids = [self._get_block_id(ndx) for ndx in range(len(offsets))]
+            futures = [self.executor.submit(self._stage_chunk, path, name, block_id, offset)
+                       for block_id, offset in zip(block_ids, offsets)]
+            staged.append((name, block_ids, futures))
+
+        commits = []
+        for name, block_ids, futures in staged:
+            for future in futures:
+                future.result()
+            commits.append(self.executor.submit(self.container.commit_block_list, name, block_ids))
+        for future in commits:
+            future.result()
+
+    def download(self, files: List[Tuple[str, Path]]) -> List[str]:
+        """
+        Downloads every (blob name, local path) pair, replacing any existing files; each file is written under a
+        temporary name and renamed into place once complete.
+        :return: the names of the blobs which were not found
+        """
+        sizes = list(self.executor.map(lambda blob_file: self.container.get_blob_size(blob_file[0]), files))
+
+        missing = []
+        pending = []
+        for (name, path), size in zip(files, sizes):
+            if size is None:
+                missing.append(name)
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'.{path.name}.download')
+            with tmp_path.open(mode='wb') as tmp_file:
+                tmp_file.truncate(size)
+            futures = [self.executor.submit(self._download_chunk, name, tmp_path, offset,
+                                            min(self.chunk_size, size - offset))
+                       for offset in range(0, size, self.chunk_size)]
+            pending.append((tmp_path, path, futures))
+
+        for tmp_path, path, futures in pending:
+            for future in futures:
+                future.result()
+            os.replace(str(tmp_path), str(path))
+        return missing
+
+    def close(self):
+        self.executor.shutdown()
+
+    def _stage_chunk(self, path: Path, name: str, block_id: str, offset: int):
+        with path.open(mode='rb') as local_file:
+            local_file.seek(offset)
+            data = local_file.read(self.chunk_size)
+        self.container.stage_block(name, block_id, data)
+
+    def _download_chunk(self, name: str, tmp_path: Path, offset: int, length: int):
+        data = self.container.download_range(name, offset, length)
+        with tmp_path.open(mode='r+b') as tmp_file:
+            tmp_file.seek(offset)
+            tmp_file.write(data)
+
+    @staticmethod
+    def _get_block_id(ndx: int) -> str:
+        # block IDs must be base64 and all of the same length within a blob
+        return base64.b64encode(f'{ndx:08d}'.encode()).decode()
@@ -1,13 +1,69 @@
 import datetime
+import fcntl
 import logging
 import mmap
 import os
 import struct
+import threading
+import time
+import zlib
 
 from pathlib import Path
+from typing import Collection, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
 
 
 DEFAULT_MAX_JOURNAL_SIZE = 64 * 1024 * 1024  # 64MB
+DEFAULT_INDEX_INTERVAL = 1024  # records
+DEFAULT_SEAL_BLOCK_SIZE = 4 * 1024 * 1024  # 4MB
+
+# header of a sealed journal: magic, codec ID, uncompressed block size and total uncompressed length; it
+# is followed by the compressed blocks, each prefixed with its compressed length
+SEALED_HEADER = struct.Struct('=4sBIQ')
+SEALED_BLOCK_HEADER = struct.Struct('=I')
+SEALED_MAGIC = b'SJNL'
+SEALED_CODECS = {'zlib': 1, 'zstd': 2, 'lz4': 3}
+
+# checksummed records are framed by the payload length before and the payload's CRC32 after
+FRAME_LENGTH_FIELD = '_frame_length'
+FRAME_CRC_FIELD = '_frame_crc'
+FRAME_OVERHEAD = 8
+
+# each day's journal records its framing in a sidecar file, so it is never guessed from the caller's settings;
+# journals without one were written before checksums existed and so are plain
+FRAMING_PLAIN = 'plain'
+FRAMING_CRC32 = 'crc32'
+
+
+def _make_crc32_table() -> np.ndarray:
+    table = np.arange(256, dtype=np.uint32)
+    for _ in range(8):
+        table = np.where(table & 1, (table >> 1) ^ np.uint32(0xEDB88320), table >> 1).astype(np.uint32)
+    return table
+
+
+CRC32_TABLE = _make_crc32_table()
+
+# entries in the sparse side index kept next to each journal.dat: timestamp and byte offset of a record
+INDEX_ENTRY = struct.Struct('=dq')
+INDEX_DTYPE = np.dtype([('time', '=f8'), ('offset', '=i8')])
+
+# type codes for the supported record field types; these are valid for both struct and numpy when prefixed
+# with '=' (native byte order, no alignment), matching the layout written by JournalAppender. strings have
+# no fixed code because they are written as a stop-bit encoded length followed by the UTF-8 bytes.
+FIELD_TYPES = {
+    'byte': 'B',
+    'boolean': '?',
+    'short': 'h',
+    'int': 'i',
+    'uint': 'I',
+    'long': 'q',
+    'float': 'f',
+    'double': 'd',
+    'string': None
+}
 
 
 class NoSpaceException(Exception):
@@ -19,12 +75,338 @@ class NoSuchJournalException(Exception):
         super(NoSuchJournalException, self).__init__("Journal file does not exist: {}".format(str(path)))
 
 
+class CorruptRecordException(Exception):
+    def __init__(self, pos: int):
+        super(CorruptRecordException, self).__init__("Journal record failed checksum at position {}".format(pos))
+
+
+class OpenJournalException(Exception):
+    def __init__(self, path: Path):
+        super(OpenJournalException, self).__init__("Journal is still open for appending: {}".format(str(path)))
+
+
+class JournalFramingException(Exception):
+    def __init__(self, path: Path, framing: str, expected: str):
+        super(JournalFramingException, self).__init__("Journal has {} record framing but was opened for {}: {}"
+                                                      .format(framing, expected, str(path)))
+
+
+class SealedJournalException(Exception):
+    def __init__(self, path: Path):
+        super(SealedJournalException, self).__init__("Journal is sealed and cannot be appended to: {}"
+                                                     .format(str(path)))
+
+
+def _get_codec(codec: str):
+    # zlib ships with Python, while zstd and lz4 need the optional zstd and lz4 extras
+    if codec == 'zlib':
+        return zlib.compress, zlib.decompress
+    elif codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    elif codec == 'lz4':
+        import lz4.block
+        return lz4.block.compress, lz4.block.decompress
+    else:
+        raise ValueError(f'unsupported codec: {codec}')
+
+
+def _encode_stopbit(value: int) -> bytes:
+    if value < 0:
+        raise ValueError('Stop-bit encoding does not support negative values')
+    encoded = bytearray()
+    while value > 127:
+        encoded.append(0x80 | (value & 0x7f))
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _decode_stopbit(data, pos: int) -> Tuple[int, int]:
+    shift = 0
+    value = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value += (b & 0x7f) << shift
+        shift += 7
+        if (b & 0x80) == 0:
+            return value, pos
+
+
+class RecordSchema:
+    """
+    Describes the sequence of typed fields which make up a single journal record, e.g. a trade print.
+    """
+
+    def __init__(self, name: str, fields: List[Tuple[str, str]], timestamp_field: Optional[str] = None,
+                 key_field: Optional[str] = None):
+        for field_name, field_type in fields:
+            if field_type not in FIELD_TYPES:
+                raise ValueError(f'unsupported type for field {field_name}: {field_type}')
+        self.name = name
+        self.fields = fields
+        self.timestamp_field = timestamp_field
+        self.key_field = key_field
+        self.framed_schema = None
+
+        # records with a timestamp (seconds since the epoch) get added to the journal's sparse time index
+        if timestamp_field is None:
+            self.timestamp_ndx = None
+        elif (timestamp_field, 'double') in fields:
+            self.timestamp_ndx = fields.index((timestamp_field, 'double'))
+        else:
+            raise ValueError(f'timestamp field must be a double field in the schema: {timestamp_field}')
+
+        # records with a key, e.g. an instrument ID, can share a multiplexed journal and be filtered or
+        # demultiplexed by key on the way out
+        if key_field is None:
+            self.key_ndx = None
+        elif key_field in self.get_field_names():
+            self.key_ndx = self.get_field_names().index(key_field)
+        else:
+            raise ValueError(f'key field is not in the schema: {key_field}')
+
+        self.string_ndx = [ndx for ndx, (_, field_type) in enumerate(fields) if field_type == 'string']
+
+        # for decoding, each run of fixed-size fields between strings gets its own precompiled struct;
+        # a None entry stands for a stop-bit length-prefixed string
+        self.segments = []
+        run = ''
+        for _, field_type in fields:
+            if field_type == 'string':
+                if run:
+                    self.segments.append(struct.Struct('=' + run))
+                    run = ''
+                self.segments.append(None)
+            else:
+                run += FIELD_TYPES[field_type]
+        if run:
+            self.segments.append(struct.Struct('=' + run))
+
+        # for encoding, the whole record is packed with a single struct; the layout depends
+        # on the string lengths so we compile and cache one struct per distinct combination
+        self.structs = {}
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_fields(self) -> List[Tuple[str, str]]:
+        return self.fields
+
+    def get_field_names(self) -> List[str]:
+        return [field_name for field_name, _ in self.fields]
+
+    def get_min_size(self) -> int:
+        """
+        Gets the smallest number of bytes a record can encode to, i.e. with every string field empty.
+        """
+        return sum(1 if field_type == 'string' else struct.calcsize('=' + FIELD_TYPES[field_type])
+                   for _, field_type in self.fields)
+
+    def framed(self) -> 'FramedRecordSchema':
+        """
+        Gets the checksummed variant of this schema, used by journals created with checksums enabled.
+        """
+        if self.framed_schema is None:
+            self.framed_schema = FramedRecordSchema(self)
+        return self.framed_schema
+
+    def get_dtype(self, string_lengths: List[int]) -> np.dtype:
+        """
+        Gets the packed numpy dtype for this schema, with one fixed-width bytes column per string field.
+        """
+        formats = []
+        string_lengths = iter(string_lengths)
+        for _, field_type in self.fields:
+            if field_type == 'string':
+                formats.append(f'S{max(next(string_lengths), 1)}')
+            else:
+                formats.append('=' + FIELD_TYPES[field_type])
+        return np.dtype({'names': self.get_field_names(), 'formats': formats})
+
+    def encode(self, values: tuple) -> Tuple[struct.Struct, tuple]:
+        """
+        Gets the precompiled struct which packs the given record values, along with the values to pack
+        into it; strings are replaced by their encoded bytes with the stop-bit length prefix.
+        """
+        if len(values) != len(self.fields):
+            raise ValueError(f'{self.name} record has {len(self.fields)} fields but got {len(values)} values')
+        if not self.string_ndx:
+            lengths = ()
+        else:
+            values = list(values)
+            lengths = []
+            for ndx in self.string_ndx:
+                encoded = values[ndx].encode()
+                values[ndx] = _encode_stopbit(len(encoded)) + encoded
+                lengths.append(len(values[ndx]))
+            lengths = tuple(lengths)
+
+        record_struct = self.structs.get(lengths)
+        if record_struct is None:
+            lengths_iter = iter(lengths)
+            fmt = '='
+            for _, field_type in self.fields:
+                if field_type == 'string':
+                    fmt += f'{next(lengths_iter)}s'
+                else:
+                    fmt += FIELD_TYPES[field_type]
+            record_struct = struct.Struct(fmt)
+            self.structs[lengths] = record_struct
+        return record_struct, values
+
+    def decode_from(self, buffer, pos: int) -> Tuple[tuple, int]:
+        """
+        Unpacks one record starting at pos in the buffer, returning the values and the position of the next record.
+        """
+        values = ()
+        for segment in self.segments:
+            if segment is None:
+                val_sz, pos = _decode_stopbit(buffer, pos)
+                values += (buffer[pos:pos + val_sz].decode(),)
+                pos += val_sz
+            else:
+                values += segment.unpack_from(buffer, pos)
+                pos += segment.size
+        return values, pos
+
+
+class FramedRecordSchema(RecordSchema):
+    """
+    Wraps a RecordSchema so every record gets framed by its payload length and a CRC32 of the payload,
+    which lets readers and crash recovery detect torn or corrupted records. Values passed in and out
+    are those of the wrapped schema; only the bulk decoded arrays carry the framing columns.
+    """
+
+    def __init__(self, payload_schema: RecordSchema):
+        super().__init__(payload_schema.get_name(),
+                         [(FRAME_LENGTH_FIELD, 'uint')] + payload_schema.get_fields() + [(FRAME_CRC_FIELD, 'uint')])
+        self.payload_schema = payload_schema
+        self.timestamp_field = payload_schema.timestamp_field
+        self.timestamp_ndx = payload_schema.timestamp_ndx
+        self.key_field = payload_schema.key_field
+        self.key_ndx = payload_schema.key_ndx
+
+    def framed(self) -> 'FramedRecordSchema':
+        return self
+
+    def encode(self, values: tuple) -> Tuple[struct.Struct, tuple]:
+        payload_struct, payload_values = self.payload_schema.encode(values)
+        payload = payload_struct.pack(*payload_values)
+        frame_struct = self.structs.get(len(payload))
+        if frame_struct is None:
+            frame_struct = struct.Struct(f'=I{len(payload)}sI')
+            self.structs[len(payload)] = frame_struct
+        return frame_struct, (len(payload), payload, zlib.crc32(payload))
+
+    def decode_from(self, buffer, pos: int) -> Tuple[tuple, int]:
+        values, next_pos = super().decode_from(buffer, pos)
+        if values[0] != next_pos - pos - FRAME_OVERHEAD or \
+                zlib.crc32(buffer[pos + 4:next_pos - 4]) != values[-1]:
+            raise CorruptRecordException(pos)
+        return values[1:-1], next_pos
+
+
+def _crc32_rows(rows: np.ndarray) -> np.ndarray:
+    # table-driven CRC32, the same as zlib.crc32(), computed for every row of a 2D byte array at once
+    crc = np.full(len(rows), 0xFFFFFFFF, dtype=np.uint32)
+    for col in range(rows.shape[1]):
+        crc = CRC32_TABLE[(crc ^ rows[:, col]) & 0xFF] ^ (crc >> 8)
+    return crc ^ np.uint32(0xFFFFFFFF)
+
+
+def _find_torn_frame(data, buf: np.ndarray, start: int, end: int, min_payload_len: int = 1) -> Optional[int]:
+    """
+    Checks the checksummed frames between start and end, returning the position of the first one which is
+    torn or corrupt, if any. Runs of same-sized frames, the norm for e.g. trades, are verified in bulk.
+    """
+    pos = start
+    while pos < end:
+        if pos + FRAME_OVERHEAD > end:
+            return pos
+        (payload_len,) = struct.unpack_from('=I', data, pos)
+
+        # the CRC32 of an empty payload is zero, so without this a zero-filled tail would pass as good frames
+        if payload_len < min_payload_len:
+            return pos
+        stride = payload_len + FRAME_OVERHEAD
+        num_frames = (end - pos) // stride
+        if num_frames > 1:
+            rows = buf[pos:pos + num_frames * stride].reshape(num_frames, stride)
+            lengths = np.ascontiguousarray(rows[:, :4]).view('=u4').ravel()
+            mismatched = np.flatnonzero(lengths != payload_len)
+            if len(mismatched) > 0:
+                rows = rows[:mismatched[0]]
+            crcs = np.ascontiguousarray(rows[:, stride - 4:]).view('=u4').ravel()
+            bad = np.flatnonzero(_crc32_rows(rows[:, 4:stride - 4]) != crcs)
+            if len(bad) > 0:
+                return pos + int(bad[0]) * stride
+            pos += len(rows) * stride
+        else:
+            if pos + stride > end or zlib.crc32(data[pos + 4:pos + stride - 4]) != \
+                    struct.unpack_from('=I', data, pos + stride - 4)[0]:
+                return pos
+            pos += stride
+    return None
+
+
+class CommitPolicy:
+    """
+    Controls how often a JournalAppender commits the data segment length header. Readers and crash recovery
+    only see data up to the last commit, so records appended after it are lost if the process dies; in
+    exchange, commits can be batched to avoid a second write to the mmap for every record.
+    """
+
+    def __init__(self, max_records: Optional[int] = 1, max_micros: Optional[int] = None):
+        self.max_records = max_records
+        self.max_micros = max_micros
+
+    @staticmethod
+    def per_record() -> 'CommitPolicy':
+        return CommitPolicy(max_records=1)
+
+    @staticmethod
+    def every_n_records(num_records: int) -> 'CommitPolicy':
+        return CommitPolicy(max_records=num_records)
+
+    @staticmethod
+    def every_n_micros(num_micros: int) -> 'CommitPolicy':
+        """
+        Commits on the first record appended at least num_micros after the last commit; note there is no
+        background timer, so the tail of an idle journal stays uncommitted until the next record or close().
+        """
+        return CommitPolicy(max_records=None, max_micros=num_micros)
+
+    @staticmethod
+    def manual() -> 'CommitPolicy':
+        """
+        Only commits on explicit calls to JournalAppender.commit() and on close.
+        """
+        return CommitPolicy(max_records=None)
+
+    def is_commit_due(self, pending_records: int, last_commit_ns: int) -> bool:
+        if self.max_records is not None and pending_records >= self.max_records:
+            return True
+        if self.max_micros is not None and time.monotonic_ns() - last_commit_ns >= self.max_micros * 1000:
+            return True
+        return False
+
+
 class MMap:
     def __init__(self, mm):
         self.mm = mm
         self.start_pos = 4
         self.pos = self.start_pos
-        self.len = ~struct.unpack('i', self.mm[0:self.start_pos])[0]
+        self.len = 0
+        self.refresh_length()
+
+    def refresh_length(self) -> int:
+        """
+        Re-reads the committed data segment length, e.g. to pick up records appended by another process.
+        """
+        self.len = ~struct.unpack_from('i', self.mm, 0)[0]
+        return self.len
 
     def get_pos(self):
         return self.pos
@@ -40,23 +422,29 @@ class MMap:
         return ret
 
     def advance(self, step: int):
+        # the data segment length is only persisted by update_length(), which JournalAppender
+        # calls according to its CommitPolicy rather than on every step of the pointer
         self.pos += step
 
-        # this is the conservative thing to do: every time we move the pointer forward, update the length
-        # however performance-wise it's not ideal because it means a seek() back to start of file plus a
-        # second write to the mmap just to ensure data segment length is persisted.
-        self.update_length()
-
     def seek_end(self):
         self.pos = len(self) + self.start_pos
 
+    def get_mapped_size(self) -> int:
+        return len(self.mm)
+
+    def resize(self, new_size: int):
+        # grows the file and the mapping in place (mremap on Linux) rather than unmapping and re-mapping
+        self.mm.resize(new_size)
+
     def update_length(self):
         self.len = self.pos - self.start_pos
         self.mm[0:4] = struct.pack('i', ~self.len)
 
     def close(self):
-        if self.mm:
-            self.mm.close()
+        if self.mm is not None:
+            # sealed journals are decompressed into a plain bytearray rather than mapped
+            if isinstance(self.mm, mmap.mmap):
+                self.mm.close()
             self.mm = None
 
     def __getitem__(self, item):
@@ -75,51 +463,143 @@ class MMap:
 class Journal:
     logger = logging.getLogger(__name__)
 
-    def __init__(self, base_path: Path, max_size: int = DEFAULT_MAX_JOURNAL_SIZE):
+    def __init__(self, base_path: Path, max_size: int = DEFAULT_MAX_JOURNAL_SIZE,
+                 commit_policy: CommitPolicy = CommitPolicy.per_record(),
+                 index_interval: int = DEFAULT_INDEX_INTERVAL, preallocate: bool = False,
+                 precreate_lead: Optional[datetime.timedelta] = None, checksums: bool = False):
         self.base_path = base_path
         self.base_path.mkdir(parents=True, exist_ok=True)
         self.max_size = max_size
+        self.commit_policy = commit_policy
+        self.index_interval = index_interval
+        self.preallocate = preallocate
+        self.precreate_lead = precreate_lead
+        self.checksums = checksums
+        self.create_lock = threading.Lock()
+        self.schemas = {}
+
+    def register_schema(self, schema: RecordSchema):
+        # with checksums enabled records get written and read with length and CRC32 framing
+        self.schemas[schema.get_name()] = schema.framed() if self.checksums else schema
+
+    def get_schema(self, schema_name: str) -> RecordSchema:
+        schema = self.schemas.get(schema_name)
+        if schema is None:
+            raise ValueError(f'unregistered record schema: {schema_name}')
+        return schema
 
     def create_reader(self, date: datetime.date = datetime.datetime.utcnow().date()):
-        return JournalReader(self, self._get_mmap(date, 'r+b'))
+        return JournalReader(self, self._get_mmap(date, 'r+b'), date)
 
     def create_appender(self, date: datetime.date = datetime.datetime.utcnow().date()):
-        return JournalAppender(self, self._get_mmap(date, 'a+b'), date)
+        lock_fd = self._lock_date(date)
+        try:
+            return JournalAppender(self, self._get_mmap(date, 'a+b'), date, lock_fd)
+        except Exception:
+            os.close(lock_fd)
+            raise
+
+    def precreate(self, date: datetime.date):
+        """
+        Creates the journal file for the given date ahead of time if it does not exist yet.
+        """
+        self._create_journal_file(self._get_mmap_path(date))
+
+    def list_dates(self) -> List[datetime.date]:
+        """
+        Gets the dates of all the journals written so far, whether or not they have been sealed.
+        """
+        dates = set()
+        for path in self.base_path.glob('[0-9]' * 8 + '/journal.*'):
+            if path.name in ('journal.dat', 'journal.sealed'):
+                dates.add(datetime.datetime.strptime(path.parent.name, '%Y%m%d').date())
+        return sorted(dates)
+
+    def compact(self, date: datetime.date, seal: bool = False, codec: str = 'zlib',
+                block_size: int = DEFAULT_SEAL_BLOCK_SIZE):
+        """
+        Truncates a closed day's journal file from its pre-allocated size to its committed data length.
+        With seal, the journal is instead replaced by a block-compressed copy which readers decompress
+        transparently but which can no longer be appended to. Blocks are compressed with zlib by default;
+        the zstd and lz4 codecs need the matching optional extras installed. Raises OpenJournalException if
+        an appender still has the day open.
+        """
+        if date >= datetime.datetime.utcnow().date():
+            raise ValueError(f'cannot compact journal for {date} as it may still be appended to')
+        mmap_path = self._get_mmap_path(date)
+        if not mmap_path.exists():
+            if self._get_sealed_path(date).exists():
+                return
+            raise NoSuchJournalException(mmap_path)
+
+        # a day is only closed once no appender holds it: one which has not rolled over yet, e.g. because nothing
+        # got written since midnight, may still have records to commit and would keep writing to the old file
+        lock_fd = os.open(str(self._get_lock_path(date)), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise OpenJournalException(mmap_path)
+            self._compact_locked(date, seal, codec, block_size)
+        finally:
+            os.close(lock_fd)
+
+    def _compact_locked(self, date: datetime.date, seal: bool, codec: str, block_size: int):
+        mmap_path = self._get_mmap_path(date)
+        if not mmap_path.exists():
+            # sealed by someone else while we waited for the lock
+            return
+
+        mm = self._get_mmap(date, 'r+b')
+        data_len = len(mm) + mm.start_pos
+        if seal:
+            sealed_path = self._get_sealed_path(date)
+            tmp_path = sealed_path.with_suffix('.tmp')
+            self.logger.info(f'sealing {data_len} bytes of {mmap_path} into {sealed_path} with {codec}')
+            compress, _ = _get_codec(codec)
+            with tmp_path.open(mode='wb') as sealed_file:
+                sealed_file.write(SEALED_HEADER.pack(SEALED_MAGIC, SEALED_CODECS[codec], block_size, data_len))
+                for block_start in range(0, data_len, block_size):
+                    block = compress(mm[block_start:min(block_start + block_size, data_len)])
+                    sealed_file.write(SEALED_BLOCK_HEADER.pack(len(block)))
+                    sealed_file.write(block)
+            mm.close()
+            os.rename(str(tmp_path), str(sealed_path))
+            mmap_path.unlink()
+        else:
+            mm.close()
+            self.logger.info(f'truncating {mmap_path} to {data_len} bytes')
+            os.truncate(str(mmap_path), data_len)
 
-    def _get_mmap(self, date: datetime.date, mode: str, extending: bool = False) -> MMap:
+    def _get_mmap(self, date: datetime.date, mode: str) -> MMap:
         mmap_path = self._get_mmap_path(date)
         if not mmap_path.exists():
-            if mode != 'r+b':
-                # switch to file create mode and create directories if needed
-                mmap_path.parent.mkdir(parents=True, exist_ok=True)
-                mode = 'w+b'
+            sealed_path = self._get_sealed_path(date)
+            if sealed_path.exists():
+                if mode != 'r+b':
+                    raise SealedJournalException(sealed_path)
+                self._check_framing(date)
+                return MMap(self._read_sealed(sealed_path))
+            elif mode != 'r+b':
+                self._create_journal_file(mmap_path)
             else:
                 # bail out, cannot read non-existent file
                 raise NoSuchJournalException(mmap_path)
 
-        mmap_file = mmap_path.open(mode=mode)
-        if mode == 'w+b':
-            # zero-fill the entire memory-map file before memory-mapping it
-            self.logger.info(f'initializing journal file at {mmap_path}')
-            os.write(mmap_file.fileno(), struct.pack('B', 0) * self.max_size)
-            mmap_file.flush()
+        # reading or recovering records with the wrong framing would misinterpret, or truncate, committed data
+        self._check_framing(date)
 
-        if mode == 'w+b':
-            # store a zero length
-            mm = MMap(self._mmap_file(mmap_file))
-            mm.update_length()
-        elif mode == 'a+b':
-            # if necessary extend the file before memory mapping
-            if extending:
-                self.logger.info(f'extending journal file to {self.max_size} bytes')
-                os.truncate(str(mmap_path), self.max_size)
-
-            # memory map and move the pointer to the end
-            mm = MMap(self._mmap_file(mmap_file))
+        mmap_file = mmap_path.open(mode=mode)
+        if mode == 'a+b':
+            # memory map and move the pointer to the end; the header only covers committed records,
+            # so anything written after the last commit before a crash simply gets overwritten
+            mm = MMap(self._mmap_file(mmap_file, self.max_size))
             mm.seek_end()
             pos = mm.get_pos()
 
             self.logger.info(f'recovering journal file from {mmap_path}; starting at position {pos}')
+            if self.checksums:
+                self._truncate_torn_records(mm, date)
         elif mode == 'r+b':
             mm = MMap(self._mmap_file(mmap_file))
         else:
@@ -127,17 +607,201 @@ class Journal:
 
         return mm
 
-    def _mmap_file(self, mmap_file):
-        return mmap.mmap(mmap_file.fileno(), self.max_size)
+    def _truncate_torn_records(self, mm: MMap, date: datetime.date):
+        # a crash can only tear the most recently written records, so when possible start validating from
+        # the last indexed record rather than the start of the journal, which is verified in bulk anyway
+        end = mm.get_pos()
+        index = self._load_index(date)
+        index = index[index['offset'] < end]
+        start = int(index['offset'][-1]) if len(index) > 0 else mm.start_pos
+
+        buf = np.frombuffer(mm.mm, dtype=np.uint8, count=end)
+        try:
+            torn_pos = _find_torn_frame(mm.mm, buf, start, end, self._get_min_payload_size())
+        finally:
+            del buf
+        if torn_pos is not None:
+            self.logger.warning(f'truncating torn records from position {torn_pos} to {end}')
+            mm.pos = torn_pos
+            mm.update_length()
+
+    def _create_journal_file(self, mmap_path: Path):
+        with self.create_lock:
+            if mmap_path.exists():
+                return
+
+            # size the file without writing it: by default it is sparse so no blocks get allocated
+            # until they are first written, while preallocate reserves them all up front; either
+            # way it is initialized under a temporary name so readers never see a partial file
+            self.logger.info(f'initializing journal file at {mmap_path}')
+            mmap_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # the framing is recorded first, so a journal file never exists without it
+            framing_path = mmap_path.with_suffix('.framing')
+            framing_tmp_path = framing_path.with_suffix('.framing.tmp')
+            framing_tmp_path.write_text(self._get_framing())
+            os.rename(str(framing_tmp_path), str(framing_path))
+
+            tmp_path = mmap_path.with_suffix('.tmp')
+            with tmp_path.open(mode='w+b') as mmap_file:
+                if self.preallocate and hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(mmap_file.fileno(), 0, self.max_size)
+                else:
+                    os.ftruncate(mmap_file.fileno(), self.max_size)
+
+                # store a zero length
+                mmap_file.write(struct.pack('i', ~0))
+            os.rename(str(tmp_path), str(mmap_path))
+
+    @staticmethod
+    def _mmap_file(mmap_file, min_size: int = 0):
+        # journals grow past max_size when they fill up and shrink to their data length when compacted,
+        # so map the whole file, first extending it if an appender needs more space than that
+        size = os.fstat(mmap_file.fileno()).st_size
+        if size < min_size:
+            os.ftruncate(mmap_file.fileno(), min_size)
+            size = min_size
+        return mmap.mmap(mmap_file.fileno(), size)
+
+    @staticmethod
+    def _read_sealed(sealed_path: Path) -> bytearray:
+        with sealed_path.open(mode='rb') as sealed_file:
+            magic, codec_id, block_size, data_len = SEALED_HEADER.unpack(sealed_file.read(SEALED_HEADER.size))
+            if magic != SEALED_MAGIC:
+                raise IOError(f'not a sealed journal: {sealed_path}')
+            codec = {codec_id: codec for codec, codec_id in SEALED_CODECS.items()}[codec_id]
+            _, decompress = _get_codec(codec)
+
+            data = bytearray(data_len)
+            pos = 0
+            while pos < data_len:
+                (block_len,) = SEALED_BLOCK_HEADER.unpack(sealed_file.read(SEALED_BLOCK_HEADER.size))
+                block = decompress(sealed_file.read(block_len))
+                data[pos:pos + len(block)] = block
+                pos += len(block)
+            return data
+
+    def _lock_date(self, date: datetime.date) -> int:
+        # appenders share the day's lock, which compact() needs exclusively; it goes away with the process
+        lock_path = self._get_lock_path(date)
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(lock_fd, fcntl.LOCK_SH)
+        return lock_fd
+
+    def _get_min_payload_size(self) -> int:
+        # every schema which may have written to the journal bounds the size of a genuine frame's payload
+        return max(min((schema.payload_schema.get_min_size() for schema in self.schemas.values()), default=1), 1)
+
+    def _get_framing(self) -> str:
+        return FRAMING_CRC32 if self.checksums else FRAMING_PLAIN
+
+    def _check_framing(self, date: datetime.date):
+        framing_path = self._get_framing_path(date)
+        framing = framing_path.read_text().strip() if framing_path.exists() else FRAMING_PLAIN
+        if framing != self._get_framing():
+            raise JournalFramingException(self._get_mmap_path(date).parent, framing, self._get_framing())
 
     def _get_mmap_path(self, date: datetime.date):
         return self.base_path.joinpath(Path('%4d%02d%02d/journal.dat' % (date.year, date.month, date.day)))
 
+    def _get_sealed_path(self, date: datetime.date):
+        return self._get_mmap_path(date).with_suffix('.sealed')
+
+    def _get_framing_path(self, date: datetime.date):
+        return self._get_mmap_path(date).with_suffix('.framing')
+
+    def _get_lock_path(self, date: datetime.date):
+        return self._get_mmap_path(date).with_suffix('.lock')
+
+    def _get_index_path(self, date: datetime.date):
+        return self._get_mmap_path(date).with_suffix('.idx')
+
+    def _load_index(self, date: datetime.date) -> np.ndarray:
+        index_path = self._get_index_path(date)
+        if not index_path.exists():
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.fromfile(str(index_path), dtype=INDEX_DTYPE)
+
+    def _open_index(self, date: datetime.date, committed_pos: int) -> int:
+        # entries for records past the committed length were left behind by a crash; drop
+        # them because the appender is about to overwrite those records with new ones
+        index = self._load_index(date)
+        valid_entries = np.searchsorted(index['offset'], committed_pos)
+        index_path = self._get_index_path(date)
+        index_fd = os.open(str(index_path), os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        if valid_entries < len(index):
+            self.logger.info(f'truncating {len(index) - valid_entries} uncommitted entries from {index_path}')
+            os.ftruncate(index_fd, int(valid_entries) * INDEX_ENTRY.size)
+        return index_fd
+
+
+class JournalPrecreator:
+    """
+    Creates upcoming journal files ahead of time for every appender in the process from a single background
+    thread, so a feedhandler with an appender per instrument does not need a timer thread for each of them.
+    Appenders sharing a journal file share its pending creation, which is only dropped once all have closed.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.thread = None
+
+    def schedule(self, journal: Journal, date: datetime.date, precreate_time: datetime.datetime):
+        # noinspection PyProtectedMember
+        mmap_path = journal._get_mmap_path(date)
+        with self.condition:
+            if mmap_path in self.pending:
+                self.pending[mmap_path][3] += 1
+            else:
+                self.pending[mmap_path] = [precreate_time, journal, date, 1]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='journal-precreate', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def cancel(self, journal: Journal, date: datetime.date):
+        # noinspection PyProtectedMember
+        mmap_path = journal._get_mmap_path(date)
+        with self.condition:
+            entry = self.pending.get(mmap_path)
+            if entry is not None:
+                entry[3] -= 1
+                if entry[3] == 0:
+                    del self.pending[mmap_path]
+
+    def _run(self):
+        while True:
+            with self.condition:
+                now = datetime.datetime.utcnow()
+                due = [mmap_path for mmap_path, entry in self.pending.items() if entry[0] <= now]
+                if len(due) == 0:
+                    next_time = min((entry[0] for entry in self.pending.values()), default=None)
+                    self.condition.wait(None if next_time is None else (next_time - now).total_seconds())
+                    continue
+                due = [self.pending.pop(mmap_path) for mmap_path in due]
+
+            # create the files outside of the lock so appenders scheduling or closing meanwhile do not wait
+            for _, journal, date, _ in due:
+                try:
+                    journal.precreate(date)
+                except Exception:
+                    self.logger.exception(f'failed to precreate journal file for {date} in {journal.base_path}')
+
+
+_precreator = JournalPrecreator()
+
 
 class JournalReader:
-    def __init__(self, journal: Journal, mm: MMap):
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, journal: Journal, mm: MMap, current_date: Optional[datetime.date] = None):
         self.journal = journal
         self.mm = mm
+        self.current_date = current_date
 
     def get_length(self):
         return len(self.mm)
@@ -168,15 +832,241 @@ class JournalReader:
 
     def read_string(self) -> str:
         val_sz = self._read_stopbit()
-        return self.mm[self.mm.next_slice(val_sz)].decode()
+        with memoryview(self.mm.mm) as view:
+            return str(view[self.mm.next_slice(val_sz)], 'utf-8')
+
+    def read_record(self, schema_name: str) -> tuple:
+        schema = self.journal.get_schema(schema_name)
+        values, next_pos = schema.decode_from(self.mm.mm, self.mm.get_pos())
+        self.mm.advance(next_pos - self.mm.get_pos())
+        return values
+
+    def seek_time(self, ts: Union[float, datetime.datetime], schema_name: str):
+        """
+        Moves to the first record of the given schema with a timestamp at or after ts, or to the end of the
+        data segment if there is none. A binary search of the journal's sparse index finds the closest
+        preceding indexed record, so at most one index interval of records gets scanned to find it.
+        """
+        if isinstance(ts, datetime.datetime):
+            ts = ts.timestamp()
+        schema = self.journal.get_schema(schema_name)
+        if schema.timestamp_ndx is None:
+            raise ValueError(f'{schema_name} records have no timestamp field')
+
+        end = len(self.mm) + self.mm.start_pos
+        pos = self.mm.start_pos
+        if self.current_date is not None:
+            # noinspection PyProtectedMember
+            index = self.journal._load_index(self.current_date)
+            index = index[index['offset'] < end]
+            ndx = np.searchsorted(index['time'], ts, side='left')
+            if ndx > 0:
+                pos = int(index['offset'][ndx - 1])
+
+        while pos < end:
+            values, next_pos = schema.decode_from(self.mm.mm, pos)
+            if values[schema.timestamp_ndx] >= ts:
+                break
+            pos = next_pos
+        self.mm.pos = min(pos, end)
+
+    def tail(self, schema_name: str, spin_count: int = 1000, max_sleep: float = 0.01,
+             keys: Optional[Collection] = None):
+        """
+        Yields records from the current position onwards as a JournalAppender, possibly in another process,
+        commits them, optionally only those whose key field is in keys. When caught up the reader spins on
+        the length header for spin_count polls and then backs off exponentially to sleeping up to max_sleep
+        seconds between polls. Once the UTC date moves past the current journal's date and a later journal
+        has data, the reader drains this journal and rolls over to the later one. The generator never
+        finishes by itself; break out of it to stop tailing.
+        """
+        key_ndx = None
+        if keys is not None:
+            key_ndx = self._get_key_ndx(self.journal.get_schema(schema_name))
+            keys = set(keys)
+
+        idle_polls = 0
+        while True:
+            end = self.mm.refresh_length() + self.mm.start_pos
+            if end > self.mm.get_mapped_size() and self.current_date is not None:
+                self._remap()
+            if self.mm.get_pos() < end:
+                idle_polls = 0
+                while self.mm.get_pos() < end:
+                    record = self.read_record(schema_name)
+                    if key_ndx is None or record[key_ndx] in keys:
+                        yield record
+            elif self._roll_over():
+                idle_polls = 0
+            else:
+                idle_polls += 1
+                if idle_polls > spin_count:
+                    time.sleep(min(max_sleep, 0.00001 * 2 ** min(idle_polls - spin_count, 20)))
+
+    def read_all(self, schema: RecordSchema, keys: Optional[Collection] = None) -> np.ndarray:
+        """
+        Decodes every record from the current position to the end of the data segment in a single pass,
+        returning a structured array with one column per schema field; string fields are returned as
+        fixed-width bytes columns. No Python objects are created per record when all the string fields
+        have a constant length, e.g. a journal of trades for a single symbol. If keys are given only
+        records whose key field is one of them are returned.
+        """
+        start = self.mm.get_pos()
+        end = len(self.mm) + self.mm.start_pos
+        if self.journal.checksums:
+            schema = schema.framed()
+
+        # the numpy view must be released before the mmap can be closed, so only copies escape from here
+        buf = np.frombuffer(self.mm.mm, dtype=np.uint8, count=end)
+        try:
+            if self.journal.checksums:
+                torn_pos = _find_torn_frame(self.mm.mm, buf, start, end, schema.payload_schema.get_min_size())
+                if torn_pos is not None:
+                    self.logger.warning(f'ignoring corrupt records from position {torn_pos} to {end}')
+                    end = torn_pos
+            records = _decode_records(self.mm.mm, buf, start, end, schema)
+        finally:
+            del buf
+
+        self.mm.seek_end()
+        if self.journal.checksums:
+            records = repack_fields(records[schema.payload_schema.get_field_names()])
+        if keys is not None:
+            self._get_key_ndx(schema)
+            records = records[np.isin(records[schema.key_field], list(keys))]
+        return records
+
+    def view(self, start: Optional[int] = None, end: Optional[int] = None) -> memoryview:
+        """
+        Gets a zero-copy view of the mapped bytes between the start and end positions, by default from the current
+        position to the end of the committed data segment. The view pins the mapping: release() it, or use it as a
+        context manager, before closing the reader or tailing it across a remap or rollover, otherwise those fail
+        with BufferError. The position of the reader does not change.
+        """
+        start, end = self._get_view_range(start, end)
+        with memoryview(self.mm.mm) as view:
+            return view[start:end]
+
+    def view_array(self, dtype, start: Optional[int] = None, count: int = -1) -> np.ndarray:
+        """
+        Gets a read-only numpy array of the given dtype backed directly by the mapped bytes, by default
+        from the current position to the end of the committed data segment. Like view(), the array pins
+        the mapping until it and any arrays derived from it are garbage collected.
+        """
+        start, end = self._get_view_range(start, None)
+        dtype = np.dtype(dtype)
+        if count < 0:
+            count = (end - start) // dtype.itemsize
+        elif start + count * dtype.itemsize > end:
+            raise ValueError(f'{count} items of {dtype} overrun the committed data segment')
+        # go through a memoryview so the array holds a buffer export; numpy does not take one on the mmap itself,
+        # which would let the mapping be closed underneath the array
+        array = np.frombuffer(memoryview(self.mm.mm), dtype=dtype, count=count, offset=start)
+        array.flags.writeable = False
+        return array
+
+    def view_records(self, schema: RecordSchema) -> np.ndarray:
+        """
+        Gets the records from the current position to the end of the data segment as a read-only structured
+        array backed directly by the mapped bytes, without decoding or copying them. This only works if
+        every record has the same size, i.e. the schema has no strings or they are all the same length, as
+        for a single-symbol trade journal; otherwise it raises ValueError and read_all() has to be used.
+        In a checksummed journal the array includes the frame length and CRC columns. Like view(), the array
+        pins the mapping until it and any arrays derived from it are garbage collected.
+        """
+        start, end = self._get_view_range(None, None)
+        if self.journal.checksums:
+            schema = schema.framed()
+        if start == end:
+            return np.empty(0, dtype=schema.get_dtype(_get_string_sizes(schema, [0] * len(schema.get_fields()))))
+
+        buf = np.frombuffer(self.mm.mm, dtype=np.uint8, count=end)
+        try:
+            layout = _get_fixed_layout(self.mm.mm, buf, start, end, schema)
+        finally:
+            del buf
+        if layout is None:
+            raise ValueError(f'{schema.get_name()} records do not all have the same size')
+        offsets, sizes, stride = layout
+
+        formats = []
+        for (_, field_type), size in zip(schema.get_fields(), sizes):
+            formats.append(f'S{size}' if field_type == 'string' else '=' + FIELD_TYPES[field_type])
+        dtype = np.dtype({'names': schema.get_field_names(), 'formats': formats, 'offsets': offsets,
+                          'itemsize': stride})
+        return self.view_array(dtype, start)
+
+    def demultiplex(self, schema: RecordSchema) -> Dict[object, np.ndarray]:
+        """
+        Decodes every record like read_all(), then splits them by key field, preserving journal order per key.
+        """
+        records = self.read_all(schema)
+        self._get_key_ndx(schema)
+        key_field = schema.key_field
+        order = np.argsort(records[key_field], kind='stable')
+        records = records[order]
+        keys, starts = np.unique(records[key_field], return_index=True)
+        return {key.item(): split for key, split in zip(keys, np.split(records, starts[1:]))}
 
     def close(self):
-        if self.mm:
+        if self.mm is not None:
             self.mm.close()
             self.mm = None
 
+    # noinspection PyProtectedMember
+    def _roll_over(self) -> bool:
+        if self.current_date is None:
+            return False
+        today = datetime.datetime.utcnow().date()
+        next_date = self.current_date + datetime.timedelta(days=1)
+        while next_date <= today:
+            # journals may be created ahead of time, so only move on once the appender has
+            # committed data to a later journal; it never goes back to an earlier one after
+            try:
+                next_mm = self.journal._get_mmap(next_date, 'r+b')
+            except NoSuchJournalException:
+                next_date += datetime.timedelta(days=1)
+                continue
+            if len(next_mm) == 0:
+                next_mm.close()
+                next_date += datetime.timedelta(days=1)
+                continue
+
+            # we may still have to drain records committed since our last poll before switching
+            if self.mm.refresh_length() + self.mm.start_pos > self.mm.get_pos():
+                next_mm.close()
+                return True
+
+            self.mm.close()
+            self.mm = next_mm
+            self.current_date = next_date
+            return True
+        return False
+
+    @staticmethod
+    def _get_key_ndx(schema: RecordSchema) -> int:
+        if schema.key_ndx is None:
+            raise ValueError(f'{schema.get_name()} records have no key field')
+        return schema.key_ndx
+
+    # noinspection PyProtectedMember
+    def _remap(self):
+        # the appender grew the journal past the size of our mapping
+        pos = self.mm.get_pos()
+        self.mm.close()
+        self.mm = self.journal._get_mmap(self.current_date, 'r+b')
+        self.mm.pos = pos
+
     def _unpack_next(self, pattern: str, num_bytes: int):
-        return struct.unpack(pattern, self.mm[self.mm.next_slice(num_bytes)])[0]
+        return struct.unpack_from(pattern, self.mm.mm, self.mm.next_pos(num_bytes))[0]
+
+    def _get_view_range(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        committed_end = len(self.mm) + self.mm.start_pos
+        start = self.mm.get_pos() if start is None else start
+        end = committed_end if end is None else end
+        if not self.mm.start_pos <= start <= end <= committed_end:
+            raise ValueError(f'range [{start}, {end}) is outside the committed data segment')
+        return start, end
 
     def _read_stopbit(self) -> int:
         shift = 0
@@ -192,15 +1082,120 @@ class JournalReader:
         self.close()
 
 
+def _scan_record(data, pos: int, schema: RecordSchema) -> Tuple[List[int], List[int], int]:
+    # walk a single record, returning the absolute offset and byte size of each field's
+    # value along with the position of the next record
+    offsets = []
+    sizes = []
+    for _, field_type in schema.get_fields():
+        if field_type == 'string':
+            val_sz, pos = _decode_stopbit(data, pos)
+        else:
+            val_sz = struct.calcsize('=' + FIELD_TYPES[field_type])
+        offsets.append(pos)
+        sizes.append(val_sz)
+        pos += val_sz
+    return offsets, sizes, pos
+
+
+def _get_string_sizes(schema: RecordSchema, sizes: List[int]) -> List[int]:
+    return [size for (_, field_type), size in zip(schema.get_fields(), sizes) if field_type == 'string']
+
+
+def _get_fixed_layout(data, buf: np.ndarray, start: int, end: int,
+                      schema: RecordSchema) -> Optional[Tuple[List[int], List[int], int]]:
+    """
+    Checks whether every record between start and end has the same string lengths as the first one, and hence
+    the same size. If so returns the offset of each field's value relative to the start of a record, the size
+    of each field's value and the record size; otherwise None.
+    """
+    offsets, sizes, next_pos = _scan_record(data, start, schema)
+    stride = next_pos - start
+    num_records, remainder = divmod(end - start, stride)
+    if remainder != 0:
+        return None
+
+    rows = buf[start:end].reshape(num_records, stride)
+    offsets = [offset - start for offset in offsets]
+    prev_end = 0
+    for (_, field_type), offset, size in zip(schema.get_fields(), offsets, sizes):
+        if field_type == 'string':
+            # every record must carry the same stop-bit length prefix as the first one
+            prefix = rows[:, prev_end:offset]
+            if not (prefix == prefix[0]).all():
+                return None
+        prev_end = offset + size
+    return offsets, sizes, stride
+
+
+def _decode_records(data, buf: np.ndarray, start: int, end: int, schema: RecordSchema) -> np.ndarray:
+    if start >= end:
+        return np.empty(0, dtype=schema.get_dtype(_get_string_sizes(schema, [0] * len(schema.get_fields()))))
+
+    # fast path: if every record has the same string lengths as the first one then all records have the
+    # same size, and the whole segment can be viewed as a 2D array of bytes and sliced column by column
+    layout = _get_fixed_layout(data, buf, start, end, schema)
+    if layout is not None:
+        offsets, sizes, stride = layout
+        rows = buf[start:end].reshape((end - start) // stride, stride)
+        records = np.empty(len(rows), dtype=schema.get_dtype(_get_string_sizes(schema, sizes)))
+        for field_name, offset, size in zip(schema.get_field_names(), offsets, sizes):
+            if size > 0:
+                column = np.ascontiguousarray(rows[:, offset:offset + size])
+                records[field_name] = column.view(records.dtype[field_name]).ravel()
+            else:
+                records[field_name] = b''
+        return records
+
+    # slow path: walk the records to locate every field, then gather each column from the buffer
+    all_offsets = []
+    all_sizes = []
+    pos = start
+    while pos < end:
+        offsets, sizes, pos = _scan_record(data, pos, schema)
+        all_offsets.append(offsets)
+        all_sizes.append(sizes)
+    all_offsets = np.array(all_offsets, dtype=np.int64)
+    all_sizes = np.array(all_sizes, dtype=np.int64)
+
+    max_sizes = all_sizes.max(axis=0)
+    records = np.empty(len(all_offsets), dtype=schema.get_dtype(_get_string_sizes(schema, max_sizes)))
+    for ndx, (field_name, field_type) in enumerate(schema.get_fields()):
+        width = max(int(max_sizes[ndx]), 1)
+        positions = all_offsets[:, ndx, np.newaxis] + np.arange(width)
+        column = buf[np.minimum(positions, end - 1)]
+        if field_type == 'string':
+            # zero-pad the strings shorter than the widest one
+            column = np.where(np.arange(width) < all_sizes[:, ndx, np.newaxis], column, 0).astype(np.uint8)
+        records[field_name] = column.view(records.dtype[field_name]).ravel()
+    return records
+
+
 class JournalAppender:
     logger = logging.getLogger(__name__)
 
-    def __init__(self, journal: Journal, mm: MMap, current_date: datetime.date):
+    def __init__(self, journal: Journal, mm: MMap, current_date: datetime.date, lock_fd: int):
         self.journal = journal
         self.mm = mm
-        self.max_size = journal.max_size
+        self.lock_fd = lock_fd
+        self.max_size = mm.get_mapped_size()
         self.current_date = current_date
         self.num_extents = 1
+        self.precreate_date = None
+
+        # each record appended, or each value written with the field-level write_*() methods, counts
+        # as one pending record towards the next commit of the data segment length
+        self.commit_policy = journal.commit_policy
+        self.pending_records = 0
+        self.last_commit_ns = time.monotonic_ns()
+
+        # every index_interval timestamped records we add an entry to the sparse time index
+        self.index_interval = journal.index_interval
+        self.index_fd = None
+        self.indexed_records = 0
+        self._open_index()
+
+        self._schedule_precreate()
 
     def write_byte(self, value: int):
         assert value < 256
@@ -208,6 +1203,7 @@ class JournalAppender:
         self._check_space(val_sz)
         mm = self._get_current_mmap()
         mm[mm.next_pos(1)] = value
+        self._end_record()
 
     def write_boolean(self, value: bool):
         self.write_byte(1 if value else 0)
@@ -234,29 +1230,74 @@ class JournalAppender:
         self._check_space(val_sz)
         mm = self._get_current_mmap()
         mm[mm.next_slice(val_sz)] = encoded
+        self._end_record()
 
-    def close(self):
-        if self.mm:
+    def append_record(self, schema_name: str, *values):
+        schema = self.journal.get_schema(schema_name)
+        record_struct, encoded_values = schema.encode(values)
+        self._check_space(record_struct.size)
+        mm = self._get_current_mmap()
+        if schema.timestamp_ndx is not None:
+            self._index_record(values[schema.timestamp_ndx], mm.get_pos())
+        record_struct.pack_into(mm.mm, mm.get_pos(), *encoded_values)
+        mm.advance(record_struct.size)
+        self._end_record()
+
+    def commit(self):
+        """
+        Persists the data segment length so everything appended so far is visible to readers and recovery.
+        """
+        if self.mm is not None:
             self.mm.update_length()
+        self.pending_records = 0
+        self.last_commit_ns = time.monotonic_ns()
+
+    def close(self):
+        if self.mm is not None:
+            self.commit()
             data_len = len(self.mm)
             self.logger.info('finalizing JournalAppender; updating data segment length to {}'.format(data_len))
             self.mm.close()
             self.mm = None
+        if self.index_fd is not None:
+            os.close(self.index_fd)
+            self.index_fd = None
+        if self.precreate_date is not None:
+            _precreator.cancel(self.journal, self.precreate_date)
+            self.precreate_date = None
+        if self.lock_fd is not None:
+            # lets the closed day get compacted
+            os.close(self.lock_fd)
+            self.lock_fd = None
 
     def _pack_next(self, pattern: str, num_bytes: int, value):
         self._check_space(num_bytes)
         mm = self._get_current_mmap()
         mm[mm.next_slice(num_bytes)] = struct.pack(pattern, value)
+        self._end_record()
+
+    def _index_record(self, ts: float, pos: int):
+        if self.index_interval > 0:
+            if self.indexed_records % self.index_interval == 0:
+                os.write(self.index_fd, INDEX_ENTRY.pack(ts, pos))
+            self.indexed_records += 1
+
+    # noinspection PyProtectedMember
+    def _open_index(self):
+        if self.index_interval > 0:
+            self.index_fd = self.journal._open_index(self.current_date, self.mm.get_pos())
+            self.indexed_records = 0
+
+    def _end_record(self):
+        self.pending_records += 1
+        if self.commit_policy.is_commit_due(self.pending_records, self.last_commit_ns):
+            self.commit()
 
     def _write_stopbit(self, value):
-        if value < 0:
-            raise ValueError('Stop-bit encoding does not support negative values')
+        encoded = _encode_stopbit(value)
+        self._check_space(len(encoded))
         mm = self._get_current_mmap()
-        while value > 127:
-            mm[self.pos] = 0x80 | (value & 0x7f)
-            mm.advance(1)
-            value >>= 7
-        mm[self.mm.next_pos(1)] = value
+        mm[mm.next_slice(len(encoded))] = encoded
 
     # noinspection PyProtectedMember
     def _get_current_mmap(self):
@@ -269,16 +1310,31 @@ class JournalAppender:
             self.current_date = now_date
             self.pos = 4
             self.start_pos = self.pos
+            self.lock_fd = self.journal._lock_date(self.current_date)
             self.mm = self.journal._get_mmap(self.current_date, mode='a+b')
+            self.max_size = self.mm.get_mapped_size()
+            self._open_index()
+            self._schedule_precreate()
 
         return self.mm
 
-    # noinspection PyProtectedMember
     def _check_space(self, add_length: int):
         if self.mm.get_pos() + add_length >= self.max_size:
-            self.mm.close()
-            self.max_size += DEFAULT_MAX_JOURNAL_SIZE
-            self.mm = self.journal._get_mmap(self.current_date, mode='a+b', extending=True)
+            while self.mm.get_pos() + add_length >= self.max_size:
+                self.max_size += self.journal.max_size
+            self.logger.info(f'extending journal file to {self.max_size} bytes')
+            self.mm.resize(self.max_size)
+            self.num_extents += 1
+
+    def _schedule_precreate(self):
+        # create tomorrow's journal file in the background shortly before midnight UTC
+        # so rolling over does not stall on creating it in the middle of the feed
+        if self.journal.precreate_lead is None:
+            return
+        next_date = self.current_date + datetime.timedelta(days=1)
+        precreate_time = datetime.datetime.combine(next_date, datetime.time()) - self.journal.precreate_lead
+        _precreator.schedule(self.journal, next_date, precreate_time)
+        self.precreate_date = next_date
 
     def __del__(self):
         self.close()
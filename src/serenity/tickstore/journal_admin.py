@@ -0,0 +1,38 @@
+import datetime
+import logging
+from pathlib import Path
+
+import fire
+
+from serenity.tickstore.journal import Journal, JournalFramingException, OpenJournalException
+from serenity.utils import init_logging
+
+
+def journal_admin(action: str, db: str, journal_dir: str = '/behemoth/journals', seal: bool = False,
+                  codec: str = 'zlib', checksums: bool = False):
+    init_logging()
+    logger = logging.getLogger(__name__)
+    if action == 'compact':
+        # compact every closed day of every journal in the db, e.g. every symbol's PHEMEX_TRADES journal;
+        # checksums must match how the feedhandler journaled, but one journal that can't be compacted
+        # should not hold up all the others
+        today = datetime.datetime.utcnow().date()
+        failed = 0
+        for journal_path in sorted(Path(f'{journal_dir}/{db}').iterdir()):
+            if journal_path.is_dir():
+                journal = Journal(journal_path, checksums=checksums)
+                for journal_date in journal.list_dates():
+                    if journal_date < today:
+                        try:
+                            journal.compact(journal_date, seal=seal, codec=codec)
+                        except (JournalFramingException, OpenJournalException) as e:
+                            logger.error(f'unable to compact journal for {journal_date}: {e}')
+                            failed += 1
+        if failed > 0:
+            raise Exception(f'failed to compact {failed} journal(s)')
+    else:
+        raise Exception(f'Unknown action: {action}')
+
+
+if __name__ == '__main__':
+    fire.Fire(journal_admin)
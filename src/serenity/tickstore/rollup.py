@@ -0,0 +1,107 @@
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from serenity.tickstore.splay import read_splay
+from serenity.tickstore.tickstore import BiTimestamp, LocalTickstore, SplayVersion
+
+
+# bar sizes supported for rollups, mapped to pandas offset aliases
+ROLLUP_FREQUENCIES = {
+    '1s': '1S',
+    '1m': '1T',
+    '5m': '5T',
+    '1h': '1H'
+}
+
+
+def get_rollup_db(db: str, frequency: str) -> str:
+    """
+    Gets the name of the sibling tickstore holding the given rollup of a trade tickstore, e.g. PHEMEX_TRADES_OHLCV_5M.
+    """
+    if frequency not in ROLLUP_FREQUENCIES:
+        raise ValueError(f'unsupported rollup frequency: {frequency}')
+    return f'{db}_OHLCV_{frequency.upper()}'
+
+
+def compute_ohlcv(trades: pd.DataFrame, frequency: str, timestamp_column: str = 'time', price_column: str = 'price',
+                  size_column: str = 'size') -> pd.DataFrame:
+    """
+    Computes open/high/low/close prices and traded volume for every bar of the given frequency which has at least
+    one trade; bars are labeled with their start time.
+    """
+    timestamps = trades.index.get_level_values(timestamp_column)
+    prices = pd.Series(trades[price_column].values, index=timestamps)
+    sizes = pd.Series(trades[size_column].values, index=timestamps)
+
+    bars = prices.resample(ROLLUP_FREQUENCIES[frequency]).ohlc()
+    bars['volume'] = sizes.resample(ROLLUP_FREQUENCIES[frequency]).sum()
+    bars = bars.dropna(subset=['open'])
+    bars.index.name = timestamp_column
+    return bars
+
+
+class Rollup:
+    """
+    Maintains OHLCV bars of a trade tickstore in one sibling tickstore per bar size. Each day of bars is inserted
+    under the same as-at date as its source splay, so the bars get the same bitemporal versioning; a day gets
+    recomputed whenever its source day has a newer version than the bars, and deleted along with it.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, source: LocalTickstore, targets: Dict[str, LocalTickstore], price_column: str = 'price',
+                 size_column: str = 'size'):
+        self.source = source
+        self.targets = targets
+        self.price_column = price_column
+        self.size_column = size_column
+
+    def run(self, symbols: Optional[List[str]] = None, start_date: Optional[datetime.date] = None,
+            end_date: Optional[datetime.date] = None) -> int:
+        """
+        Brings the rollups of the given symbols and dates, by default all of them, up to date with the source.
+        :return: the number of (symbol, date, bar size) rollups recomputed or deleted
+        """
+        updated = 0
+        for symbol, symbol_index in list(self.source.index.symbols.items()):
+            if symbols is not None and symbol not in symbols:
+                continue
+            for as_at_date in list(symbol_index.dates):
+                if (start_date is not None and as_at_date < start_date) or \
+                        (end_date is not None and as_at_date > end_date):
+                    continue
+                updated += self._update(symbol, as_at_date)
+        return updated
+
+    def _update(self, symbol: str, as_at_date: datetime.date) -> int:
+        source_version = _get_latest_version(self.source, symbol, as_at_date)
+        stale_targets = {}
+        for frequency, target in self.targets.items():
+            target_version = _get_latest_version(target, symbol, as_at_date)
+            if source_version is None:
+                if target_version is not None:
+                    self.logger.info(f'deleting {frequency} rollup of {symbol} for {as_at_date}')
+                    target.delete(symbol, BiTimestamp(as_at_date))
+                    stale_targets[frequency] = target
+            elif target_version is None or target_version.start_time < source_version.start_time:
+                stale_targets[frequency] = target
+
+        if source_version is not None and len(stale_targets) > 0:
+            trades = read_splay(source_version.path)
+            for frequency, target in stale_targets.items():
+                self.logger.info(f'computing {frequency} rollup of {symbol} for {as_at_date} '
+                                 f'from version {source_version.version}')
+                bars = compute_ohlcv(trades, frequency, self.source.timestamp_column, self.price_column,
+                                     self.size_column)
+                target.insert(symbol, BiTimestamp(as_at_date), bars)
+        return len(stale_targets)
+
+
+def _get_latest_version(tickstore: LocalTickstore, symbol: str, as_at_date: datetime.date) -> Optional[SplayVersion]:
+    versions = tickstore.index.get_versions(symbol, as_at_date)
+    if len(versions) > 0 and versions[-1].is_valid(BiTimestamp.latest_as_of):
+        return versions[-1]
+    return None
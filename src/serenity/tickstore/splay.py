@@ -0,0 +1,263 @@
+import datetime
+import os
+import threading
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024  # rows
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024  # 1GB
+
+
+class SplayFormat(ABC):
+    """
+    Base class for the on-disk formats of the per-symbol, per-day splay files written by LocalTickstore.
+    """
+
+    name = None
+    extension = None
+
+    @abstractmethod
+    def write(self, path: Path, ticks: pd.DataFrame):
+        """
+        Writes the ticks, including their timestamp index, to a new splay file at the given path.
+        """
+        pass
+
+    @abstractmethod
+    def read(self, path: Path, columns: Optional[List[str]] = None, start: Optional[datetime.datetime] = None,
+             end: Optional[datetime.datetime] = None) -> pd.DataFrame:
+        """
+        Reads the ticks from the splay file at the given path, optionally only the given columns; the timestamp
+        index is always included. If start and/or end are given, parts of the file which hold no ticks between
+        them are skipped where the format allows it. This is only a coarse filter, e.g. by row group, so the
+        result may still contain ticks outside the range and callers need to apply the exact time filter.
+        """
+        pass
+
+
+class HDF5SplayFormat(SplayFormat):
+    """
+    The original splay format: a blosc-compressed, fixed-format pandas HDF5 file. Fixed-format files have no
+    per-column access, so column projection happens after loading. They do support reading a slice of rows,
+    though: if the splay has a sorted timestamp index, only its index array is read and binary searched,
+    and then just the rows in the time range get loaded.
+
+    PyTables is not thread-safe, so reads are serialized within a process; HDF5 splays can only be decompressed
+    in parallel across processes.
+    """
+
+    name = 'hdf5'
+    extension = '.h5'
+    lock = threading.Lock()
+
+    def write(self, path: Path, ticks: pd.DataFrame):
+        with self.lock:
+            ticks.to_hdf(str(path), 'ticks', mode='w', append=False, complevel=9, complib='blosc')
+
+    def read(self, path: Path, columns: Optional[List[str]] = None, start: Optional[datetime.datetime] = None,
+             end: Optional[datetime.datetime] = None) -> pd.DataFrame:
+        with self.lock:
+            row_range = None
+            if start is not None or end is not None:
+                row_range = self._find_row_range(path, start, end)
+
+            if row_range is None:
+                # noinspection PyTypeChecker
+                ticks: pd.DataFrame = pd.read_hdf(str(path))
+            else:
+                # noinspection PyTypeChecker
+                ticks: pd.DataFrame = pd.read_hdf(str(path), start=row_range[0], stop=row_range[1])
+        if columns is not None:
+            ticks = ticks[columns]
+        return ticks
+
+    @staticmethod
+    def _find_row_range(path: Path, start: Optional[datetime.datetime],
+                        end: Optional[datetime.datetime]) -> Optional[Tuple[int, int]]:
+        with pd.HDFStore(str(path), mode='r') as store:
+            storer = store.get_storer(store.keys()[0])
+            if storer.is_table or storer.pandas_type != 'frame':
+                return None
+
+            # a fixed-format frame keeps its row index in axis1; with a MultiIndex axis1 does not exist
+            index_node = store.get_node(f'{storer.group._v_pathname}/axis1')
+            if index_node is None or getattr(index_node.attrs, 'kind', None) != 'datetime64':
+                return None
+            timestamps = index_node.read()
+            if len(timestamps) > 1 and not (timestamps[1:] >= timestamps[:-1]).all():
+                # splays written before ticks were sorted on insert
+                return None
+
+        first = 0 if start is None else int(np.searchsorted(timestamps, pd.Timestamp(start).value, side='left'))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, pd.Timestamp(end).value,
+                                                                       side='right'))
+        return first, max(first, last)
+
+
+class ParquetSplayFormat(SplayFormat):
+    """
+    Columnar splay format based on Apache Parquet, which requires pyarrow, e.g. from the parquet extra. Every column
+    is compressed separately, either with the same codec or with a codec per column name, and every row group
+    carries min/max statistics for every column, including the timestamp index. Only the requested columns
+    get read from disk, and only from the row groups whose timestamp statistics overlap the requested range.
+    """
+
+    name = 'parquet'
+    extension = '.parquet'
+
+    def __init__(self, compression: Union[str, Dict[str, str]] = 'zstd', row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def write(self, path: Path, ticks: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # format version 2.6 is needed to store the timestamps at full nanosecond precision; pyarrow releases
+        # before 4.0 don't know it and instead only have the now deprecated 2.0, which did the same
+        version = '2.6' if int(pa.__version__.split('.')[0]) >= 4 else '2.0'
+        table = pa.Table.from_pandas(ticks, preserve_index=True)
+        pq.write_table(table, str(path), version=version, compression=self.compression,
+                       row_group_size=self.row_group_size, write_statistics=True)
+
+    def read(self, path: Path, columns: Optional[List[str]] = None, start: Optional[datetime.datetime] = None,
+             end: Optional[datetime.datetime] = None) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(str(path))
+        row_groups = None
+        if start is not None or end is not None:
+            row_groups = self._find_row_groups(parquet_file, start, end)
+
+        if row_groups is None:
+            table = parquet_file.read(columns=columns, use_pandas_metadata=True)
+        else:
+            table = parquet_file.read_row_groups(row_groups, columns=columns, use_pandas_metadata=True)
+        return table.to_pandas()
+
+    @staticmethod
+    def _find_row_groups(parquet_file, start: Optional[datetime.datetime],
+                         end: Optional[datetime.datetime]) -> Optional[List[int]]:
+        arrow_schema = parquet_file.schema.to_arrow_schema()
+        index_columns = (arrow_schema.pandas_metadata or {}).get('index_columns', [])
+        if len(index_columns) != 1 or not isinstance(index_columns[0], str):
+            return None
+        column_ndx = arrow_schema.get_field_index(index_columns[0])
+
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        row_groups = []
+        metadata = parquet_file.metadata
+        for ndx in range(metadata.num_row_groups):
+            stats = metadata.row_group(ndx).column(column_ndx).statistics
+            if stats is not None and stats.has_min_max:
+                if (start is not None and pd.Timestamp(stats.max) < start) or \
+                        (end is not None and pd.Timestamp(stats.min) > end):
+                    continue
+            row_groups.append(ndx)
+        return row_groups
+
+
+SPLAY_FORMATS = {splay_format.name: splay_format for splay_format in [HDF5SplayFormat, ParquetSplayFormat]}
+SPLAY_EXTENSIONS = {splay_format.extension: splay_format for splay_format in [HDF5SplayFormat, ParquetSplayFormat]}
+
+
+def get_splay_format(splay_format: Union[str, SplayFormat]) -> SplayFormat:
+    """
+    Gets a splay format with default settings by name, or passes through an already-configured one.
+    """
+    if isinstance(splay_format, SplayFormat):
+        return splay_format
+    elif splay_format in SPLAY_FORMATS:
+        return SPLAY_FORMATS[splay_format]()
+    else:
+        raise ValueError(f'unsupported splay format: {splay_format}')
+
+
+def get_splay_format_for_path(path: Path) -> SplayFormat:
+    """
+    Gets the splay format to read an existing splay file with, based on its file extension.
+    """
+    suffix = Path(path).suffix
+    if suffix not in SPLAY_EXTENSIONS:
+        raise IOError(f'unsupported splay file type: {path}')
+    return SPLAY_EXTENSIONS[suffix]()
+
+
+def read_splay(path: Path, columns: Optional[List[str]] = None, start: Optional[datetime.datetime] = None,
+               end: Optional[datetime.datetime] = None) -> pd.DataFrame:
+    """
+    Reads an existing splay file in whichever format it was written; see SplayFormat.read().
+    """
+    return get_splay_format_for_path(path).read(Path(path), columns, start, end)
+
+
+class SplayCache:
+    """
+    In-process LRU cache of loaded splays keyed by splay path and version. Once the in-memory size of the cached
+    splays exceeds max_bytes the least recently used ones get evicted; splays larger than that are never cached.
+    Safe to share between threads and between several tickstores.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path: str, version: int) -> Optional[pd.DataFrame]:
+        key = (os.path.abspath(path), version)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, path: str, version: int, ticks: pd.DataFrame):
+        key = (os.path.abspath(path), version)
+        size_bytes = int(ticks.memory_usage(index=True, deep=True).sum())
+        with self.lock:
+            self._remove(key)
+            if size_bytes > self.max_bytes:
+                return
+            self.entries[key] = (ticks, size_bytes)
+            self.size_bytes += size_bytes
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, path: str, version: int):
+        with self.lock:
+            self._remove((os.path.abspath(path), version))
+
+    def clear(self, path_prefix: Optional[str] = None):
+        """
+        Evicts every cached splay, or only those whose path is under the given directory.
+        """
+        with self.lock:
+            if path_prefix is None:
+                self.entries.clear()
+                self.size_bytes = 0
+            else:
+                path_prefix = os.path.join(os.path.abspath(path_prefix), '')
+                for key in [key for key in self.entries if key[0].startswith(path_prefix)]:
+                    self._remove(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
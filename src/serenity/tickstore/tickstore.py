@@ -1,16 +1,39 @@
 import datetime
+import fcntl
+import json
 import logging
+import os
 import os.path
 import re
 import shutil
+import tempfile
+import threading
 
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple
+from itertools import groupby
+from typing import Collection, Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from serenity.tickstore.blob import BlobContainer, BlobTransfer, DEFAULT_TRANSFER_CHUNK_SIZE, \
+    DEFAULT_TRANSFER_WORKERS
+from serenity.tickstore.splay import SplayCache, SplayFormat, SPLAY_EXTENSIONS, get_splay_format, read_splay
+
+
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_CHECKPOINT_INTERVAL = 1000  # index log entries
+DEFAULT_SCAN_WORKERS = 8
+DEFAULT_SELECT_WORKERS = 8
+DEFAULT_HOT_DAYS = 90
+DEFAULT_MIGRATION_INTERVAL = 60 * 60  # seconds
+
+SPLAY_FILENAME_PATTERN = re.compile(r'(.*?)_(\d+)\.(h5|parquet)$')
+
 
 class BiTimestamp:
     """
@@ -44,13 +67,182 @@ class Tickstore(ABC):
 
     @abstractmethod
     def select(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
-               as_of_time: datetime.datetime = BiTimestamp.latest_as_of) -> pd.DataFrame:
+               as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Selects all ticks between start and end timestamps, optionally restricted to version effective as of as_of_time.
+        Selects all ticks between start and end timestamps, optionally restricted to version effective as of as_of_time
+        and to the given columns; the timestamp index is always included.
         :return: a DataFrame with the content matching the query
         """
         pass
 
+    @abstractmethod
+    def select_dates(self, symbol: str, dates: Collection[datetime.date], start: datetime.datetime,
+                     end: datetime.datetime, as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Variant of select() which only reads the ticks stored under the given dates, e.g. for serving different
+        dates of a symbol from different tickstores. Ticks are still only trimmed to start and end, so ticks of
+        one of the dates which spill over into a neighbouring day, like late prints after midnight, are included.
+        """
+        pass
+
+    def select_by_day(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
+                      as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+                      columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Streaming variant of select() which lazily yields the matching ticks one day at a time, in date order, so
+        callers can start processing before the whole range is loaded.
+        """
+        day = start.date()
+        while day <= end.date():
+            day_start = max(start, datetime.datetime.combine(day, datetime.time.min))
+            day_end = min(end, datetime.datetime.combine(day, datetime.time.max))
+            ticks = self.select(symbol, day_start, day_end, as_of_time, columns)
+            if not ticks.empty:
+                yield ticks
+            day += datetime.timedelta(days=1)
+
+    def iter_select(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
+                    as_of_time: datetime.datetime = BiTimestamp.latest_as_of, columns: Optional[List[str]] = None,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Lazily yields the same ticks as select() in time-ordered chunks of chunk_rows (the last one may be shorter),
+        holding roughly one day of ticks in memory at a time. Ticks spilling over into the next day's time range,
+        e.g. late prints just after midnight, get merged in order; this assumes no day's earliest tick is earlier
+        than the previous day's, which holds as long as ticks are stored under the date they happened on.
+        """
+        return _rechunk(self._merge_days(self.select_by_day(symbol, start, end, as_of_time, columns)), chunk_rows)
+
+    def select_many(self, symbols: List[str], start: datetime.datetime, end: datetime.datetime,
+                    as_of_time: datetime.datetime = BiTimestamp.latest_as_of, columns: Optional[List[str]] = None,
+                    layout: str = 'long', workers: int = DEFAULT_SELECT_WORKERS) -> pd.DataFrame:
+        """
+        Selects the ticks of several symbols between start and end timestamps. Every symbol's ticks are read a day
+        at a time, with up to workers symbols read in parallel, and merged into time order as they arrive:
+
+        - layout='long': ticks indexed by (timestamp, symbol); simultaneous ticks are in the order of symbols
+        - layout='wide': one row per distinct timestamp with a (symbol, column) column per symbol holding the
+          symbol's latest values as of that timestamp, like a merge_asof of every symbol onto all timestamps
+
+        :return: a DataFrame with the content matching the query
+        """
+        if layout not in ('long', 'wide'):
+            raise ValueError(f'unsupported layout: {layout}')
+
+        chunks = []
+        carry = None
+        # each symbol only ever has its next chunk being read, so the pool can be smaller than the number of symbols
+        max_workers = max(1, min(workers, len(symbols)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbol-reader') as executor:
+            streams = {symbol: self._merge_days(self.select_by_day(symbol, start, end, as_of_time, columns))
+                       for symbol in symbols}
+            for parts in self._merge_symbols(streams, executor):
+                if layout == 'long':
+                    chunks.append(self._to_long(parts))
+                else:
+                    wide = self._to_wide(parts, carry)
+                    carry = wide.iloc[[-1]]
+                    chunks.append(wide)
+        if len(chunks) == 0:
+            return pd.DataFrame()
+
+        ticks = pd.concat(chunks, sort=False) if len(chunks) > 1 else chunks[0]
+        if layout == 'wide':
+            ticks = ticks[[column for symbol in symbols for column in ticks.columns if column[0] == symbol]]
+        return ticks
+
+    def _merge_symbols(self, streams: Dict[str, Iterator[pd.DataFrame]],
+                       executor: Executor) -> Iterator[List[Tuple[str, pd.DataFrame]]]:
+        # a k-way merge over the time-ordered chunks of every symbol: the next chunk of each symbol is always being
+        # read ahead, and everything buffered before the earliest last buffered tick of any unfinished symbol is
+        # final, so gets yielded as one list of (symbol, ticks) parts in symbol order
+        reading = {symbol: executor.submit(next, stream, None) for symbol, stream in streams.items()}
+        buffers = {symbol: None for symbol in streams}
+
+        def read_next(next_symbol: str):
+            ticks = reading[next_symbol].result()
+            if ticks is None:
+                del reading[next_symbol]
+                return
+            reading[next_symbol] = executor.submit(next, streams[next_symbol], None)
+            pending = buffers[next_symbol]
+            buffers[next_symbol] = ticks if pending is None or pending.empty else pd.concat([pending, ticks])
+
+        while True:
+            for symbol in [symbol for symbol in reading if buffers[symbol] is None or buffers[symbol].empty]:
+                read_next(symbol)
+            if any(buffers[symbol] is None or buffers[symbol].empty for symbol in reading):
+                continue
+            if len(reading) == 0:
+                parts = [(symbol, ticks) for symbol, ticks in buffers.items() if ticks is not None and not ticks.empty]
+                if len(parts) > 0:
+                    yield parts
+                return
+
+            watermark = min(self._get_timestamps(buffers[symbol])[-1] for symbol in reading)
+            parts = []
+            for symbol, ticks in buffers.items():
+                if ticks is None or ticks.empty:
+                    continue
+                cut = self._get_timestamps(ticks).searchsorted(watermark, side='left')
+                if cut > 0:
+                    parts.append((symbol, ticks.iloc[:cut]))
+                    buffers[symbol] = ticks.iloc[cut:]
+            if len(parts) > 0:
+                yield parts
+
+            # whatever is left of the symbols holding up the watermark is all at the watermark, so needs their next
+            # chunk before it is known whether anything still comes before it
+            for symbol in [symbol for symbol in reading if self._get_timestamps(buffers[symbol])[-1] == watermark]:
+                read_next(symbol)
+
+    def _to_long(self, parts: List[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+        ticks = pd.concat([ticks for _, ticks in parts], keys=[symbol for symbol, _ in parts], names=['symbol'])
+        ticks = ticks.reorder_levels(list(range(1, ticks.index.nlevels)) + [0])
+        timestamps = np.concatenate([self._get_timestamps(ticks).values for _, ticks in parts])
+        return ticks.iloc[np.argsort(timestamps, kind='mergesort')]
+
+    def _to_wide(self, parts: List[Tuple[str, pd.DataFrame]], carry: Optional[pd.DataFrame]) -> pd.DataFrame:
+        # spread every symbol's ticks over its own columns, carry the latest values forward across symbols and
+        # keep only the last row for every timestamp
+        frames = [] if carry is None else [carry]
+        for symbol, ticks in parts:
+            timestamps = self._get_timestamps(ticks)
+            ticks = ticks.copy(deep=False)
+            ticks.index = timestamps
+            ticks.columns = pd.MultiIndex.from_product([[symbol], ticks.columns])
+            frames.append(ticks)
+        wide = pd.concat(frames, sort=False)
+        offset = 0 if carry is None else 1
+        order = np.argsort(wide.index.values[offset:], kind='mergesort') + offset
+        wide = wide.iloc[np.concatenate([np.arange(offset), order])].ffill().iloc[offset:]
+        return wide.loc[~wide.index.duplicated(keep='last')]
+
+    def _merge_days(self, days: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        # everything buffered before the first tick of the next day is final; anything after has to be merged with it
+        pending = None
+        for ticks in days:
+            if ticks.empty:
+                continue
+            if pending is None:
+                pending = ticks
+                continue
+            timestamps = self._get_timestamps(pending)
+            cut = timestamps.searchsorted(self._get_timestamps(ticks)[0], side='left')
+            if cut > 0:
+                yield pending.iloc[:cut]
+            if cut < len(pending):
+                merged = pd.concat([pending.iloc[cut:], ticks])
+                pending = merged.iloc[np.argsort(self._get_timestamps(merged).values, kind='mergesort')]
+            else:
+                pending = ticks
+        if pending is not None:
+            yield pending
+
+    def _get_timestamps(self, ticks: pd.DataFrame) -> pd.Index:
+        return ticks.index.get_level_values(0)
+
     @abstractmethod
     def insert(self, symbol: str, ts: BiTimestamp, ticks: pd.DataFrame):
         """
@@ -87,151 +279,597 @@ class Tickstore(ABC):
         pass
 
 
+def _rechunk(frames: Iterator[pd.DataFrame], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # re-slices a stream of DataFrames into ones of exactly chunk_rows rows, except possibly the last
+    if chunk_rows < 1:
+        raise ValueError(f'chunk_rows must be positive: {chunk_rows}')
+    buffer = []
+    buffered_rows = 0
+    for frame in frames:
+        buffer.append(frame)
+        buffered_rows += len(frame)
+        if buffered_rows >= chunk_rows:
+            combined = pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+            full_rows = buffered_rows - buffered_rows % chunk_rows
+            for offset in range(0, full_rows, chunk_rows):
+                yield combined.iloc[offset:offset + chunk_rows]
+            buffer = [combined.iloc[full_rows:]]
+            buffered_rows -= full_rows
+    if buffered_rows > 0:
+        yield pd.concat(buffer)
+
+
+def _scan_numbered_dirs(path: str) -> List[os.DirEntry]:
+    with os.scandir(path) as entries:
+        return [entry for entry in entries if entry.name.isdigit() and entry.is_dir()]
+
+
+def _scan_month_dir(month_path: str, year: int, month: int) -> List[Tuple[str, datetime.date, int]]:
+    # lists the day directories of a month along with their mtimes, which change whenever a splay is added or removed
+    return [(day_dir.path, datetime.date(year, month, int(day_dir.name)), day_dir.stat().st_mtime_ns)
+            for day_dir in _scan_numbered_dirs(month_path)]
+
+
+def _parse_splay_name(splay_name: str) -> Tuple[str, int]:
+    # extract symbol and version
+    symbol_search = SPLAY_FILENAME_PATTERN.match(splay_name)
+    if symbol_search:
+        return symbol_search.group(1), int(symbol_search.group(2))
+    else:
+        raise IOError(f'{splay_name} does not match $SYMBOL_$VERSION.h5 or $SYMBOL_$VERSION.parquet')
+
+
+def _scan_day_dir(day_path: str, splay_date: datetime.date) -> List[Tuple[str, datetime.date, int, str,
+                                                                          datetime.datetime]]:
+    splays = []
+    with os.scandir(day_path) as entries:
+        for entry in entries:
+            if not entry.name.endswith(tuple(SPLAY_EXTENSIONS)) or not entry.is_file():
+                continue
+            symbol, symbol_version = _parse_splay_name(entry.name)
+
+            # for portability use mtime as ctime is not reliably mapped to creation time on UNIX
+            last_mod_time = datetime.datetime.utcfromtimestamp(entry.stat().st_mtime)
+
+            splays.append((symbol, splay_date, symbol_version, entry.path, last_mod_time))
+    return splays
+
+
+class SplayVersion:
+    """
+    One version of a splay, valid from start_time to end_time (inclusive) in the as-of timeline.
+    """
+
+    __slots__ = ['version', 'start_time', 'end_time', 'path']
+
+    def __init__(self, version: int, start_time: datetime.datetime, end_time: datetime.datetime, path: str):
+        self.version = version
+        self.start_time = start_time
+        self.end_time = end_time
+        self.path = path
+
+    def is_valid(self, as_of_time: datetime.datetime) -> bool:
+        return self.start_time <= as_of_time <= self.end_time
+
+
+class SymbolIndex:
+    """
+    The splays of a single symbol: a sorted array of as-at dates, each with its list of versions in version order.
+    Versions of a date cover consecutive intervals of the as-of timeline, so only a handful ever exist per date.
+    """
+
+    def __init__(self):
+        self.dates = []
+        self.versions = []
+
+    def get_versions(self, as_at_date: datetime.date) -> List[SplayVersion]:
+        ndx = bisect_left(self.dates, as_at_date)
+        if ndx < len(self.dates) and self.dates[ndx] == as_at_date:
+            return self.versions[ndx]
+        return []
+
+    def add_version(self, as_at_date: datetime.date, splay_version: SplayVersion):
+        ndx = bisect_left(self.dates, as_at_date)
+        if ndx == len(self.dates) or self.dates[ndx] != as_at_date:
+            self.dates.insert(ndx, as_at_date)
+            self.versions.insert(ndx, [])
+        versions = self.versions[ndx]
+        version_ndx = bisect_left([existing.version for existing in versions], splay_version.version)
+        if version_ndx < len(versions) and versions[version_ndx].version == splay_version.version:
+            versions[version_ndx] = splay_version
+        else:
+            versions.insert(version_ndx, splay_version)
+
+    def select(self, start: datetime.date, end: datetime.date,
+               as_of_time: datetime.datetime) -> List[Tuple[datetime.date, SplayVersion]]:
+        selected = []
+        for ndx in range(bisect_left(self.dates, start), bisect_right(self.dates, end)):
+            for splay_version in self.versions[ndx]:
+                if splay_version.is_valid(as_of_time):
+                    selected.append((self.dates[ndx], splay_version))
+        return selected
+
+    def remove_date(self, as_at_date: datetime.date):
+        ndx = bisect_left(self.dates, as_at_date)
+        if ndx < len(self.dates) and self.dates[ndx] == as_at_date:
+            del self.dates[ndx]
+            del self.versions[ndx]
+
+
+class IndexLock:
+    """
+    Advisory lock on a file next to a tickstore index, exclusive across processes as well as threads. It is
+    re-entrant within a thread so locked index operations can call each other.
+    """
+
+    def __init__(self, lock_path: Path):
+        self.lock_path = lock_path
+        self.thread_lock = threading.RLock()
+        self.lock_file = None
+        self.depth = 0
+
+    def is_held(self) -> bool:
+        """
+        Whether the calling thread holds the lock.
+        """
+        # only the owning thread can have the depth above zero while it holds the thread lock
+        if not self.thread_lock.acquire(blocking=False):
+            return False
+        try:
+            return self.depth > 0
+        finally:
+            self.thread_lock.release()
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.lock_file = self.lock_path.open(mode='a')
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self.lock_file is not None:
+                    self.lock_file.close()
+                    self.lock_file = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.depth -= 1
+        if self.depth == 0:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+        self.thread_lock.release()
+
+
 class DataFrameIndex:
     """
-    HDF5- and Pandas-based multi-level index used by LocalTickstore.
+    HDF5- and Pandas-based multi-level index used by LocalTickstore. Rather than rewriting the whole index on
+    every flush, mutations get appended to a transaction log next to it, which is replayed on open and folded
+    back into the HDF5 file by a checkpoint once it holds checkpoint_interval entries.
+
+    Several processes can write to the same index. Every mutation takes an advisory lock on index.lock, first
+    catches up with whatever other writers appended to the log since, or reloads the index if another writer
+    checkpointed it, and then appends its own entries to the log before releasing the lock. Opening an existing
+    index and reading it take no lock, so need no write access: checkpoints are renamed into place and the log
+    only ever grows until then. Reads are served from memory as of the last open or mutation, so do not see
+    other writers' changes until then.
+
+    In memory the index is held as one SymbolIndex per symbol, so lookups are binary searches over the dates of
+    a single symbol rather than masks over the whole table; it is only converted to and from the multi-level
+    DataFrame stored in HDF5 when loaded and checkpointed.
     """
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, base_path: Path, index_path: Path, table_name: str):
+    def __init__(self, base_path: Path, index_path: Path, table_name: str,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL, scan_workers: int = DEFAULT_SCAN_WORKERS):
         self.base_path = base_path
         self.index_path = index_path
+        self.log_path = index_path.with_suffix('.log')
+        self.scan_path = index_path.with_suffix('.dirs.json')
         self.table_name = table_name
+        self.checkpoint_interval = checkpoint_interval
+        self.scan_workers = scan_workers
+        self.lock = IndexLock(index_path.with_suffix('.lock'))
         self.dirty = False
-
-        if not self.index_path.exists():
-            self.logger.info(f'rebuilding {self.index_path}')
-            self._build_index()
+        self.pending_entries = []
+        self.log_entries = 0
+        self.log_offset = 0
+        self.index_stamp = None
+        self.mutated = False
+        self.symbols = {}
+
+        if self.index_path.exists():
+            self._reload()
         else:
-            # noinspection PyTypeChecker
-            existing_index: pd.DataFrame = pd.read_hdf(str(self.index_path))
-            self.df = existing_index
+            with self.lock:
+                if not self.index_path.exists():
+                    self.logger.info(f'rebuilding {self.index_path}')
+                    self._build_index()
+                else:
+                    self._reload()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        The whole index as a DataFrame indexed by symbol, date and version, as stored in HDF5.
+        """
+        rows = []
+        for symbol, symbol_index in self.symbols.items():
+            for as_at_date, versions in zip(symbol_index.dates, symbol_index.versions):
+                for splay_version in versions:
+                    rows.append((symbol, as_at_date, splay_version.version, splay_version.start_time,
+                                 splay_version.end_time, splay_version.path))
+        return self._to_frame(rows, ['symbol', 'date', 'version'])
 
     def select(self, symbol: str, start: datetime.date, end: datetime.date,
                as_of_time: datetime.datetime) -> pd.DataFrame:
         # short circuit if symbol missing
-        if symbol not in self.df.index.get_level_values('symbol'):
+        symbol_index = self.symbols.get(symbol)
+        if symbol_index is None:
             return pd.DataFrame()
 
         # find all dates in range where as_of_time is between start_time and end_time
-        symbol_data = self.df.loc[symbol]
-        mask = (symbol_data.index.get_level_values('date') >= pd.to_datetime(start)) \
-            & (symbol_data.index.get_level_values('date') <= pd.to_datetime(end)) \
-            & (symbol_data['start_time'] <= as_of_time) \
-            & (symbol_data['end_time'] >= as_of_time)
-        selected = self.df.loc[symbol][mask]
-        return selected
+        selected = symbol_index.select(self._to_date(start), self._to_date(end), as_of_time)
+        return self._to_frame([(as_at_date, splay_version.version, splay_version.start_time, splay_version.end_time,
+                                splay_version.path) for as_at_date, splay_version in selected], ['date', 'version'])
 
     def insert(self, symbol: str, as_at_date: datetime.date, create_write_path_func) -> Path:
         # if there's at least one entry in the index for this (symbol, as_at_date)
         # increment the version and set the start/end times such that the previous
         # version is logically deleted and the next version becomes latest
-        idx = pd.IndexSlice
-        self.df.sort_index(inplace=True)
-        try:
-            all_versions = self.df.loc[idx[symbol, as_at_date, :]]
-        except KeyError:
-            all_versions = pd.DataFrame()
-
-        if all_versions.any().any():
-            start_time = datetime.datetime.utcnow()
-            end_time = BiTimestamp.latest_as_of
-
-            # this bit of awfulness is because sometimes self.df.loc[] returns
-            # a scalar and sometimes it returns a Tuple; I have no idea how to
-            # make it always return one or the other.
-            prev_version_ndx = all_versions.index.values[-1]
-            if isinstance(prev_version_ndx, Tuple):
-                prev_version = prev_version_ndx[2]
+        #
+        # the version is only known once any versions inserted by other writers are loaded, so
+        # create_write_path_func gets called under the index lock and must publish the splay by then
+        with self.lock:
+            self._sync()
+            all_versions = self.get_versions(symbol, as_at_date)
+            if len(all_versions) > 0:
+                start_time = datetime.datetime.utcnow()
+                end_time = BiTimestamp.latest_as_of
+                prev_version = all_versions[-1].version
+                version = prev_version + 1
             else:
-                prev_version = prev_version_ndx
-            version = prev_version + 1
-            self.df.loc[idx[symbol, pd.to_datetime(as_at_date), prev_version], 'end_time'] = start_time
-        else:
-            start_time = BiTimestamp.start_as_of
-            end_time = BiTimestamp.latest_as_of
-            version = 0
+                start_time = BiTimestamp.start_as_of
+                end_time = BiTimestamp.latest_as_of
+                prev_version = None
+                version = 0
 
-        write_path = create_write_path_func(version)
+            write_path = create_write_path_func(version)
 
-        path = str(write_path)
-        self.df.loc[idx[symbol, pd.to_datetime(as_at_date), version], ['start_time', 'end_time', 'path']] = \
-            [start_time, end_time, path]
-
-        # dirty the index
-        self._mark_dirty(True)
+            if prev_version is not None:
+                self._log(self._make_entry('end', symbol, as_at_date, prev_version, end_time=start_time))
+            self._log(self._make_entry('insert', symbol, as_at_date, version, start_time=start_time,
+                                       end_time=end_time, path=str(write_path)))
+            self._append_log()
 
         return write_path
 
     def delete(self, symbol: str, as_at_date: datetime.date):
-        idx = pd.IndexSlice
-        self.df.sort_index(inplace=True)
-        try:
-            all_versions = self.df.loc[idx[symbol, as_at_date, :]]
-        except KeyError:
-            all_versions = pd.DataFrame()
-
-        if all_versions.any().any():
-            start_time = datetime.datetime.utcnow()
+        with self.lock:
+            self._sync()
+            all_versions = self.get_versions(symbol, as_at_date)
+            if len(all_versions) > 0:
+                start_time = datetime.datetime.utcnow()
+                prev_version = all_versions[-1].version
+                self._log(self._make_entry('end', symbol, as_at_date, prev_version, end_time=start_time))
+                self._append_log()
+
+    def import_versions(self, symbol: str, as_at_date: datetime.date, splay_versions: List[SplayVersion]):
+        """
+        Replaces all versions of the given symbol's splay for the given date with the given ones, keeping their
+        version numbers and start/end times, e.g. to move a date over from another index.
+        """
+        with self.lock:
+            self._sync()
+            self._log(self._make_entry('remove', symbol, as_at_date))
+            for splay_version in splay_versions:
+                self._log(self._make_entry('insert', symbol, as_at_date, splay_version.version,
+                                           start_time=splay_version.start_time, end_time=splay_version.end_time,
+                                           path=str(splay_version.path)))
+            self._append_log()
+
+    def remove(self, symbol: str, as_at_date: datetime.date):
+        """
+        Drops every version of the given symbol's splay for the given date from the index, as if it was never
+        inserted; unlike delete() this loses its history, so it is meant for dates whose splays are removed.
+        """
+        with self.lock:
+            self._sync()
+            if len(self.get_versions(symbol, as_at_date)) > 0:
+                self._log(self._make_entry('remove', symbol, as_at_date))
+                self._append_log()
 
-            # see note above in insert()
-            prev_version_ndx = all_versions.index.values[-1]
-            if isinstance(prev_version_ndx, Tuple):
-                prev_version = prev_version_ndx[2]
-            else:
-                prev_version = prev_version_ndx
-            self.df.loc[idx[symbol, as_at_date, prev_version], 'end_time'] = start_time
+    def reindex(self, incremental: bool = False):
+        """
+        Rebuilds the index from the splay files on disk. An incremental reindex only rescans the date directories
+        whose mtime changed since the last (re)index, e.g. because splays were copied in or removed, and keeps
+        the versions of all other dates as they are; the versions of every rescanned date get rebuilt from the
+        files just as with a full reindex.
+        """
+        with self.lock:
+            if incremental and self.scan_path.exists():
+                self._sync()
+                self._reindex_changed()
+                return
 
-            # dirty the index
-            self._mark_dirty(True)
+            self._clear()
+            self._build_index()
 
-    def reindex(self):
+    def rebuild(self, splays: List[Tuple[str, datetime.date, int, str, datetime.datetime]]):
+        """
+        Rebuilds the index from the given (symbol, date, version, path, last modified time) splays rather than
+        the splay files on disk, e.g. from a listing of remote storage; versions are dated as in reindex().
+        """
+        with self.lock:
+            self._clear()
+            if self.scan_path.exists():
+                self.scan_path.unlink()
+            self.symbols = {}
+            self._add_splays(sorted(splays))
+            self._write_checkpoint()
+
+    def _clear(self):
         self.index_path.unlink()
-        self._build_index()
+        if self.log_path.exists():
+            self.log_path.unlink()
+        self.pending_entries = []
+        self.log_entries = 0
 
     def flush(self):
-        if self.dirty:
-            self.logger.info(f'flushing index to {self.index_path}')
-            self.df.to_hdf(str(self.index_path), self.table_name, mode='w', append=False, complevel=9, complib='blosc')
-            self._mark_dirty(False)
+        # entries are appended to the log as they are made, so there is only a checkpoint to do; that is left
+        # to writers, so merely reading a long log does not need write access
+        if self.dirty or (self.mutated and self.log_entries >= self.checkpoint_interval):
+            with self.lock:
+                self._append_log()
+                if self.log_entries >= self.checkpoint_interval:
+                    self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Rewrites the whole index, including any changes by other writers, to HDF5 and clears the transaction log.
+        """
+        with self.lock:
+            self._sync()
+            self._write_checkpoint()
+
+    def _write_checkpoint(self):
+        # write-then-rename so a crash leaves either the old or the new index behind; replaying log
+        # entries on top of an index which already contains them is harmless
+        self.logger.info(f'checkpointing index to {self.index_path}')
+        tmp_path = self.index_path.with_suffix('.tmp')
+        self.df.to_hdf(str(tmp_path), self.table_name, mode='w', append=False, complevel=9, complib='blosc')
+        os.replace(str(tmp_path), str(self.index_path))
+        if self.log_path.exists():
+            self.log_path.unlink()
+        self.pending_entries = []
+        self.log_entries = 0
+        self.log_offset = 0
+        self.index_stamp = self._get_index_stamp()
+        self._mark_dirty(False)
+
+    def _sync(self):
+        # catch up with other writers: reload if the index got checkpointed under us, otherwise replay
+        # whatever got appended to the log since we last read it
+        if self._get_index_stamp() != self.index_stamp:
+            self.logger.info(f'reloading {self.index_path} checkpointed by another writer')
+            self._reload()
+        elif self.log_path.exists() and self.log_path.stat().st_size > self.log_offset:
+            self._replay_log()
+
+    def _reload(self):
+        # without the lock another writer may checkpoint while we read, folding the log we are about to replay
+        # into a newer index.h5; that shows up as a changed stamp, so start over from the new one
+        while True:
+            index_stamp = self._get_index_stamp()
+            # noinspection PyTypeChecker
+            existing_index: pd.DataFrame = pd.read_hdf(str(self.index_path))
+            self._load(existing_index)
+            self.log_entries = 0
+            self.log_offset = 0
+            self._replay_log()
+            if self._get_index_stamp() == index_stamp:
+                self.index_stamp = index_stamp
+                return
+
+    def _append_log(self):
+        if len(self.pending_entries) == 0:
+            return
+        self.logger.info(f'appending {len(self.pending_entries)} entries to {self.log_path}')
+        with self.log_path.open(mode='a') as log_file:
+            log_file.writelines(json.dumps(entry) + '\n' for entry in self.pending_entries)
+            log_file.flush()
+            os.fsync(log_file.fileno())
+            self.log_offset = log_file.tell()
+        self.log_entries += len(self.pending_entries)
+        self.pending_entries = []
+        self.mutated = True
+        self._mark_dirty(False)
+
+    def _get_index_stamp(self) -> Optional[Tuple[int, int, int]]:
+        # a checkpoint renames a new file into place, so a changed inode means another writer checkpointed
+        if not self.index_path.exists():
+            return None
+        stat = self.index_path.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _make_entry(op: str, symbol: str, as_at_date: datetime.date, version: Optional[int] = None,
+                    **times_and_path) -> dict:
+        entry = {'op': op, 'symbol': symbol, 'date': DataFrameIndex._to_date(as_at_date).isoformat()}
+        if version is not None:
+            entry['version'] = int(version)
+        for key, value in times_and_path.items():
+            entry[key] = value.isoformat() if isinstance(value, datetime.datetime) else value
+        return entry
+
+    def _log(self, entry: dict):
+        self._apply(entry)
+        self.pending_entries.append(entry)
+        self._mark_dirty(True)
+
+    def _apply(self, entry: dict):
+        as_at_date = datetime.date.fromisoformat(entry['date'])
+        if entry['op'] == 'insert':
+            symbol_index = self.symbols.setdefault(entry['symbol'], SymbolIndex())
+            symbol_index.add_version(as_at_date, SplayVersion(entry['version'],
+                                                              datetime.datetime.fromisoformat(entry['start_time']),
+                                                              datetime.datetime.fromisoformat(entry['end_time']),
+                                                              entry['path']))
+        elif entry['op'] == 'end':
+            for splay_version in self.get_versions(entry['symbol'], as_at_date):
+                if splay_version.version == entry['version']:
+                    splay_version.end_time = datetime.datetime.fromisoformat(entry['end_time'])
+        elif entry['op'] == 'remove':
+            symbol_index = self.symbols.get(entry['symbol'])
+            if symbol_index is not None:
+                symbol_index.remove_date(as_at_date)
+                if len(symbol_index.dates) == 0:
+                    del self.symbols[entry['symbol']]
+        else:
+            raise ValueError(f'unknown index log operation: {entry["op"]}')
+
+    def get_versions(self, symbol: str, as_at_date: datetime.date) -> List[SplayVersion]:
+        """
+        Gets all versions of the given symbol's splay for the given date, in version order.
+        """
+        symbol_index = self.symbols.get(symbol)
+        if symbol_index is None:
+            return []
+        return symbol_index.get_versions(self._to_date(as_at_date))
+
+    def _load(self, index_df: pd.DataFrame):
+        # one pass over the stored rows in (symbol, date, version) order builds the sorted per-symbol arrays
+        self.symbols = {}
+        index_df = index_df.sort_index()
+        symbols = index_df.index.get_level_values('symbol')
+        dates = [self._to_date(as_at_date) for as_at_date in index_df.index.get_level_values('date')]
+        versions = index_df.index.get_level_values('version')
+        # start_as_of lies just before pd.Timestamp.min, so these can't go through nanosecond timestamps
+        start_times = [self._to_datetime(start_time) for start_time in index_df['start_time']]
+        end_times = [self._to_datetime(end_time) for end_time in index_df['end_time']]
+        for symbol, as_at_date, version, start_time, end_time, path in \
+                zip(symbols, dates, versions, start_times, end_times, index_df['path']):
+            symbol_index = self.symbols.get(symbol)
+            if symbol_index is None:
+                symbol_index = SymbolIndex()
+                self.symbols[symbol] = symbol_index
+            if len(symbol_index.dates) == 0 or symbol_index.dates[-1] != as_at_date:
+                symbol_index.dates.append(as_at_date)
+                symbol_index.versions.append([])
+            symbol_index.versions[-1].append(SplayVersion(int(version), start_time, end_time, path))
+
+    @staticmethod
+    def _to_frame(rows: List[tuple], index_columns: List[str]) -> pd.DataFrame:
+        columns = index_columns + ['start_time', 'end_time', 'path']
+        index_df = pd.DataFrame(rows, columns=columns)
+        index_df['date'] = pd.to_datetime(index_df['date'])
+        index_df['version'] = index_df['version'].astype('int64')
+        index_df.set_index(index_columns, inplace=True)
+        return index_df
+
+    @staticmethod
+    def _to_datetime(as_of_time) -> datetime.datetime:
+        if isinstance(as_of_time, pd.Timestamp):
+            return as_of_time.to_pydatetime()
+        return as_of_time
+
+    @staticmethod
+    def _to_date(as_at_date) -> datetime.date:
+        if isinstance(as_at_date, datetime.datetime):
+            return as_at_date.date()
+        elif isinstance(as_at_date, datetime.date):
+            return as_at_date
+        else:
+            return pd.to_datetime(as_at_date).date()
+
+    def _replay_log(self):
+        # replays the log from where we last left off, which is the start of the log after a (re)load
+        if not self.log_path.exists():
+            return
+        with self.log_path.open(mode='rb') as log_file:
+            log_file.seek(self.log_offset)
+            pos = self.log_offset
+            for line in log_file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete entry')
+                    entry = json.loads(line)
+                except ValueError:
+                    # without the lock this may be an entry still being appended, so only a writer can tell it is
+                    # a torn write of the last entry; it cuts it off so later entries go after the good ones
+                    if self.lock.is_held():
+                        self.logger.warning(f'truncating corrupt entry at the end of {self.log_path}')
+                        os.truncate(str(self.log_path), pos)
+                    break
+                self._apply(entry)
+                self.log_entries += 1
+                pos += len(line)
+        self.log_offset = pos
 
     def _build_index(self):
         # initialize index; for backward compatibility support generating an index
         # from directories and files only. in this mode we also rewrite the paths
         # to support the bitemporal storage engine.
-        index_rows = []
-        tmp_path_index = defaultdict(list)
-        splay_paths = list(self.base_path.rglob("*.h5"))
-        splay_paths.sort()
-        for path in splay_paths:
-            # extract date
-            parts = path.parts
-            year = int(parts[-4])
-            month = int(parts[-3])
-            day = int(parts[-2])
-            splay_date = datetime.date(year, month, day)
-
-            # extract symbol
-            filename = parts[-1]
-            symbol_search = re.search(r'(.*?)_(\d+)\.h5', filename)
-            if symbol_search:
-                symbol = symbol_search.group(1)
-                symbol_version = int(symbol_search.group(2))
-            else:
-                raise IOError(f'{filename} does not match $SYMBOL_$VERSION.h5')
-
-            # for portability use mtime as ctime is not reliably mapped to creation time on UNIX
-            last_mod_time = datetime.datetime.utcfromtimestamp(os.path.getmtime(str(path)))
-
-            tmp_path_index[(symbol, splay_date)].append((symbol_version, str(path), last_mod_time))
-
-        for (symbol, splay_date), versions in tmp_path_index.items():
-            for ndx, version_entry in enumerate(versions):
-                symbol_version = version_entry[0]
-                path = version_entry[1]
-                last_mod_time = version_entry[2]
-
+        day_dirs = self._scan_day_dirs()
+        self.symbols = {}
+        self._add_splays(self._scan_splays(list(day_dirs.values())))
+
+        # save to compressed HDF5 along with the state of the directories we scanned
+        self._write_checkpoint()
+        self._save_scanned_dirs(day_dirs)
+
+    def _reindex_changed(self):
+        scanned_dirs = json.loads(self.scan_path.read_text())
+        day_dirs = self._scan_day_dirs()
+        changed_dirs = [day_dir for key, day_dir in day_dirs.items() if scanned_dirs.get(key) != day_dir[2]]
+        stale_dates = {datetime.datetime.strptime(key, '%Y/%m/%d').date()
+                       for key in scanned_dirs if key not in day_dirs}
+        stale_dates.update(splay_date for _, splay_date, _ in changed_dirs)
+        self.logger.info(f'rescanning {len(changed_dirs)} changed date directories out of {len(day_dirs)}')
+
+        for symbol in list(self.symbols.keys()):
+            symbol_index = self.symbols[symbol]
+            for stale_date in stale_dates:
+                symbol_index.remove_date(stale_date)
+            if len(symbol_index.dates) == 0:
+                del self.symbols[symbol]
+        self._add_splays(self._scan_splays(changed_dirs))
+
+        self._write_checkpoint()
+        self._save_scanned_dirs(day_dirs)
+
+    def _scan_day_dirs(self) -> Dict[str, Tuple[str, datetime.date, int]]:
+        # splays live in YYYY/MM/DD directories; list the months serially, then their days in parallel
+        month_dirs = []
+        for year_dir in _scan_numbered_dirs(str(self.base_path)):
+            for month_dir in _scan_numbered_dirs(year_dir.path):
+                month_dirs.append((month_dir.path, int(year_dir.name), int(month_dir.name)))
+
+        day_dirs = {}
+        with ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix='index-scanner') as executor:
+            for month_day_dirs in executor.map(lambda month_dir: _scan_month_dir(*month_dir), month_dirs):
+                for day_path, splay_date, mtime_ns in month_day_dirs:
+                    day_dirs[splay_date.strftime('%Y/%m/%d')] = (day_path, splay_date, mtime_ns)
+        return day_dirs
+
+    def _scan_splays(self, day_dirs: List[Tuple[str, datetime.date, int]]) -> List[tuple]:
+        splays = []
+        with ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix='index-scanner') as executor:
+            for day_splays in executor.map(lambda day_dir: _scan_day_dir(day_dir[0], day_dir[1]), day_dirs):
+                splays.extend(day_splays)
+        splays.sort()
+        return splays
+
+    def _add_splays(self, splays: List[tuple]):
+        # splays must be sorted by symbol, date and version
+        for (symbol, splay_date), versions in groupby(splays, key=lambda splay: (splay[0], splay[1])):
+            versions = list(versions)
+            symbol_index = self.symbols.setdefault(symbol, SymbolIndex())
+            for ndx, (_, _, symbol_version, path, last_mod_time) in enumerate(versions):
                 # the very first version starts at start of time, while every other
                 # version starts when the version was created (last modified); we are
                 # assuming here that versions are immutable, so all bets are off if
@@ -246,35 +884,12 @@ class DataFrameIndex:
                 if ndx == (len(versions) - 1):
                     end_time = BiTimestamp.latest_as_of
                 else:
-                    end_time = versions[ndx + 1][2]
-
-                # create the row for the DataFrame in dict format so we can
-                # efficiently build the DataFrame all at once
-                index_rows.append({'symbol': symbol,
-                                   'date': splay_date,
-                                   'start_time': start_time,
-                                   'end_time': end_time,
-                                   'version': symbol_version,
-                                   'path': path
-                                   })
-
-        # build a DataFrame with multi-level index and then save to compressed HDF5. since we will
-        # need to build the index after first rows inserted also capture whether it's an empty index.
-        if len(index_rows) > 0:
-            index_df = pd.DataFrame(index_rows)
-        else:
-            index_df = pd.DataFrame(columns=['symbol',
-                                             'date',
-                                             'start_time',
-                                             'end_time',
-                                             'version',
-                                             'path'])
+                    end_time = versions[ndx + 1][4]
 
-        index_df.set_index(['symbol', 'date', 'version'], inplace=True)
-        self.df = index_df
+                symbol_index.add_version(splay_date, SplayVersion(symbol_version, start_time, end_time, path))
 
-        self._mark_dirty()
-        self.flush()
+    def _save_scanned_dirs(self, day_dirs: Dict[str, Tuple[str, datetime.date, int]]):
+        self.scan_path.write_text(json.dumps({key: mtime_ns for key, (_, _, mtime_ns) in day_dirs.items()}))
 
     def _mark_dirty(self, dirty=True):
         self.dirty = dirty
@@ -285,14 +900,28 @@ class DataFrameIndex:
 
 class LocalTickstore(Tickstore):
     """
-    Tickstore meant to run against local disk for maximum performance.
+    Tickstore meant to run against local disk for maximum performance. New splays are written in the given
+    splay format, e.g. 'hdf5' or 'parquet'; existing splays are read in whichever format they were written.
+    With read_workers > 1 splays are loaded in parallel on a pool of threads or, with read_executor='process',
+    processes; threads suit Parquet splays, while HDF5 splays need processes to decompress in parallel.
+    Given a SplayCache, which may be shared with other tickstores, whole splays get cached in memory and
+    repeated queries over the same dates are served from it instead of decompressing them again.
     """
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, base_path: Path, timestamp_column: str = 'date'):
+    def __init__(self, base_path: Path, timestamp_column: str = 'date', splay_format: Union[str, SplayFormat] = 'hdf5',
+                 read_workers: int = 1, read_executor: str = 'thread', splay_cache: Optional[SplayCache] = None):
+        if read_executor not in ('thread', 'process'):
+            raise ValueError(f'unsupported read executor: {read_executor}')
+
         self.base_path = base_path.resolve()
         self.timestamp_column = timestamp_column
+        self.splay_format = get_splay_format(splay_format)
+        self.read_workers = read_workers
+        self.read_executor = read_executor
+        self.executor = None
+        self.splay_cache = splay_cache
 
         # initialize storage location
         self.base_path.mkdir(parents=True, exist_ok=True)
@@ -306,7 +935,8 @@ class LocalTickstore(Tickstore):
         self.closed = False
 
     def select(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
-               as_of_time: datetime.datetime = BiTimestamp.latest_as_of) -> pd.DataFrame:
+               as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
         self._check_closed('select')
 
         # pass 1: grab the list of splays matching the start / end range that are valid for as_of_time
@@ -314,48 +944,117 @@ class LocalTickstore(Tickstore):
         if selected.empty:
             return selected
 
-        # load all ticks in range into memory
-        loaded_dfs = []
-        for index, row in selected.iterrows():
-            loaded_dfs.append(pd.read_hdf(row['path']))
+        # pass 2: load all ticks matching the exact start/end timestamps into memory; the splays come back
+        # sorted and in date order, so they only need merging where they overlap in time
+        return self._merge_splays(list(self._load_splays(selected, start, end, columns)))
 
-        # pass 2: select ticks matching the exact start/end timestamps
-        # noinspection PyTypeChecker
-        all_ticks = pd.concat(loaded_dfs)
-        time_mask = (all_ticks.index.get_level_values(self.timestamp_column) >= start) \
-            & (all_ticks.index.get_level_values(self.timestamp_column) <= end)
+    def select_dates(self, symbol: str, dates: Collection[datetime.date], start: datetime.datetime,
+                     end: datetime.datetime, as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        self._check_closed('select_dates')
 
-        # sort the ticks -- probably need to optimize this to sort on paths and sort ticks on ingest
-        selected_ticks = all_ticks.loc[time_mask]
-        selected_ticks.sort_index(inplace=True)
-        return selected_ticks
+        selected = self.index.select(symbol, start.date(), end.date(), as_of_time)
+        if not selected.empty:
+            dates = set(dates)
+            selected = selected.loc[[as_at_date.date() in dates
+                                     for as_at_date in selected.index.get_level_values('date')]]
+        if selected.empty:
+            return pd.DataFrame()
+        return self._merge_splays(list(self._load_splays(selected, start, end, columns)))
+
+    def select_by_day(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
+                      as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+                      columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        self._check_closed('select_by_day')
+
+        selected = self.index.select(symbol, start.date(), end.date(), as_of_time)
+        if selected.empty:
+            return
+        yield from self._load_splays(selected, start, end, columns)
 
     def insert(self, symbol: str, ts: BiTimestamp, ticks: pd.DataFrame):
         self._check_closed('insert')
         as_at_date = ts.as_at()
 
+        # splays are kept sorted by timestamp so reads of a time range can skip the rest of the file
+        # and selects can merge splays rather than sort all the ticks
+        if self.timestamp_column in ticks.index.names:
+            ticks = self._sort(ticks)
+
+        # do the tick write in the configured splay format under a temporary name, outside of the index lock
+        tmp_path = self._get_tmp_path(self._get_splay_path(symbol, as_at_date, 0, self.splay_format.extension))
+        self._write_splay(tmp_path, ticks)
+
         # compose a splay path based on YYYY/MM/DD, symbol and version and pass in as a functor
-        # so it can be populated with the bitemporal version
+        # so it can be populated with the bitemporal version; the splay gets renamed into place
+        # before the index refers to it
         def create_write_path(version: int):
-            path = f'{as_at_date.year}/{as_at_date.month:02d}/{as_at_date.day:02d}/{symbol}_{version:04d}.h5'
-            full_path = self.base_path.joinpath(path)
+            full_path = self._get_splay_path(symbol, as_at_date, version, self.splay_format.extension)
             self.logger.info(f'writing new data file to {full_path}')
+            self._publish_splay(tmp_path, full_path)
             return full_path
 
-        write_path = self.index.insert(symbol, as_at_date, create_write_path)
+        self._invalidate_cache(symbol, as_at_date)
+        try:
+            self.index.insert(symbol, as_at_date, create_write_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
 
-        # do the tick write, with blosc compression
-        write_path.parent.mkdir(parents=True, exist_ok=True)
-        ticks.to_hdf(str(write_path), 'ticks', mode='w', append=False, complevel=9, complib='blosc')
+    def reindex(self, incremental: bool = False):
+        self.index.reindex(incremental)
+        if self.splay_cache is not None:
+            self.splay_cache.clear(str(self.base_path))
+
+    def export_versions(self, symbol: str, as_at_date: datetime.date) -> List[SplayVersion]:
+        """
+        Gets all versions of the given symbol's splay for the given date with the paths of their splay files,
+        for copying the date into another tickstore with import_versions().
+        """
+        self._check_closed('export_versions')
+        return list(self.index.get_versions(symbol, as_at_date))
 
-    def reindex(self):
-        self.index.reindex()
+    def import_versions(self, symbol: str, as_at_date: datetime.date, splay_versions: List[SplayVersion]):
+        """
+        Copies in the splay files of the given versions, e.g. exported from another tickstore, and makes them the
+        versions of the given date, replacing any existing ones. Versions keep their numbers and start/end times,
+        so queries as of any time get the same ticks as from the tickstore they came from.
+        """
+        self._check_closed('import_versions')
+        self._invalidate_cache(symbol, as_at_date)
+        imported = []
+        for splay_version in splay_versions:
+            splay_path = Path(splay_version.path)
+            write_path = self._get_splay_path(symbol, as_at_date, splay_version.version, splay_path.suffix)
+            self._copy_splay(splay_path, write_path)
+            imported.append(SplayVersion(splay_version.version, splay_version.start_time, splay_version.end_time,
+                                         str(write_path)))
+        self.index.import_versions(symbol, as_at_date, imported)
+
+    def remove(self, symbol: str, ts: BiTimestamp):
+        """
+        Physically removes every version of the given symbol's splay for the given date, e.g. once the date has
+        been moved to another tickstore. Unlike delete() this does not keep the history of the date.
+        """
+        self._check_closed('remove')
+        splay_versions = self.index.get_versions(symbol, ts.as_at_date)
+        if len(splay_versions) == 0:
+            return
+        self._invalidate_cache(symbol, ts.as_at_date)
+        self.index.remove(symbol, ts.as_at_date)
+
+        # the index must no longer refer to the files by the time they are gone
+        self.flush()
+        self._remove_splays([Path(splay_version.path) for splay_version in splay_versions])
 
     def delete(self, symbol: str, ts: BiTimestamp):
         self._check_closed('delete')
+        self._invalidate_cache(symbol, ts.as_at_date)
         self.index.delete(symbol, ts.as_at_date)
 
     def destroy(self):
+        if self.splay_cache is not None:
+            self.splay_cache.clear(str(self.base_path))
         if self.base_path.exists():
             shutil.rmtree(self.base_path)
 
@@ -365,35 +1064,500 @@ class LocalTickstore(Tickstore):
     def close(self):
         if not self.closed:
             self.index.flush()
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
             self.closed = True
 
+    def _get_splay_path(self, symbol: str, as_at_date: datetime.date, version: int, extension: str) -> Path:
+        path = f'{as_at_date.year}/{as_at_date.month:02d}/{as_at_date.day:02d}/{symbol}_{version:04d}{extension}'
+        return self.base_path.joinpath(path)
+
+    def _write_splay(self, write_path: Path, ticks: pd.DataFrame):
+        write_path.parent.mkdir(parents=True, exist_ok=True)
+        self.splay_format.write(write_path, ticks)
+
+    def _copy_splay(self, splay_path: Path, write_path: Path):
+        tmp_path = self._get_tmp_path(write_path)
+        shutil.copy2(str(splay_path), str(tmp_path))
+        self._publish_splay(tmp_path, write_path)
+
+    def _publish_splay(self, tmp_path: Path, write_path: Path):
+        # an atomic rename, so readers and reindexing never see a partially written splay
+        os.replace(str(tmp_path), str(write_path))
+
+    @staticmethod
+    def _get_tmp_path(write_path: Path) -> Path:
+        # unique per writer, in the same directory so it can be renamed into place; the .tmp
+        # suffix keeps it from getting picked up as a splay by a reindex
+        write_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=f'.{write_path.stem}.', dir=str(write_path.parent))
+        os.close(fd)
+        return Path(tmp_path)
+
+    def _remove_splays(self, splay_paths: List[Path]):
+        for splay_path in splay_paths:
+            if splay_path.exists():
+                splay_path.unlink()
+
+    def _load_splays(self, selected: pd.DataFrame, start: datetime.datetime, end: datetime.datetime,
+                     columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        # yields the ticks in each selected splay, in date order, sorted and trimmed to the exact start/end
+        # timestamps; with a pool we keep a bounded number of reads in flight ahead of the consumer
+        selected = selected.sort_index()
+        splays = iter(zip(selected['path'].tolist(), selected.index.get_level_values('version').tolist()))
+        executor = self._get_executor()
+        max_pending = 1 if executor is None else 2 * self.read_workers
+
+        pending = deque()
+        try:
+            for path, version in splays:
+                pending.append(self._start_load(executor, path, version, start, end, columns))
+                if len(pending) >= max_pending:
+                    break
+            while pending:
+                path, version, loading = pending.popleft()
+                next_splay = next(splays, None)
+                if next_splay is not None:
+                    pending.append(self._start_load(executor, *next_splay, start, end, columns))
+                yield self._finish_load(path, version, loading, start, end, columns)
+        finally:
+            # the caller stopped iterating early
+            for _, _, loading in pending:
+                if isinstance(loading, Future):
+                    loading.cancel()
+
+    def _start_load(self, executor: Optional[Executor], path: str, version: int, start: datetime.datetime,
+                    end: datetime.datetime, columns: Optional[List[str]]) -> Tuple[str, int, object]:
+        # returns the cached splay, a future for a splay being read by the pool, or None for a splay to read inline
+        if self.splay_cache is not None:
+            ticks = self.splay_cache.get(path, version)
+            if ticks is not None:
+                return path, version, ticks
+        if executor is None:
+            return path, version, None
+        return path, version, executor.submit(read_splay, path, *self._get_read_args(start, end, columns))
+
+    def _finish_load(self, path: str, version: int, loading: object, start: datetime.datetime,
+                     end: datetime.datetime, columns: Optional[List[str]]) -> pd.DataFrame:
+        if isinstance(loading, pd.DataFrame):
+            ticks = loading
+        else:
+            if loading is None:
+                ticks = read_splay(path, *self._get_read_args(start, end, columns))
+            else:
+                ticks = loading.result()
+            ticks = self._sort(ticks)
+            if self.splay_cache is not None:
+                self.splay_cache.put(path, version, ticks)
+
+        # cached splays are whole, so still need projecting
+        if self.splay_cache is not None and columns is not None:
+            ticks = ticks[columns]
+        return self._trim(ticks, start, end)
+
+    def _get_read_args(self, start: datetime.datetime, end: datetime.datetime,
+                       columns: Optional[List[str]]) -> tuple:
+        if self.splay_cache is not None:
+            # cache whole splays so they can serve any later query
+            return None, None, None
+        return columns, start, end
+
+    def _invalidate_cache(self, symbol: str, as_at_date: datetime.date):
+        if self.splay_cache is not None:
+            for splay_version in self.index.get_versions(symbol, as_at_date):
+                self.splay_cache.invalidate(splay_version.path, splay_version.version)
+
+    def _trim(self, ticks: pd.DataFrame, start: datetime.datetime, end: datetime.datetime) -> pd.DataFrame:
+        # splays written before ticks were sorted on insert get sorted on the way out
+        ticks = self._sort(ticks)
+        time_mask = (ticks.index.get_level_values(self.timestamp_column) >= start) \
+            & (ticks.index.get_level_values(self.timestamp_column) <= end)
+        return ticks.loc[time_mask]
+
+    def _merge_splays(self, splays: List[pd.DataFrame]) -> pd.DataFrame:
+        # sorted splays which don't overlap in time are in time order when in date order, so concatenating them is
+        # enough; only runs of overlapping splays, e.g. with late ticks spilling over midnight, need merging
+        groups = []
+        group_end = None
+        for ticks in splays:
+            if ticks.empty:
+                continue
+            timestamps = self._get_timestamps(ticks)
+            if group_end is not None and timestamps[0] < group_end:
+                groups[-1].append(ticks)
+            else:
+                groups.append([ticks])
+            group_end = timestamps[-1] if group_end is None else max(group_end, timestamps[-1])
+        if len(groups) == 0:
+            return pd.concat(splays)
+
+        merged = []
+        for group in groups:
+            if len(group) == 1:
+                merged.append(group[0])
+            else:
+                # a k-way merge: timsort picks up the k pre-sorted runs, so this is O(n log k) rather than a full sort
+                ticks = pd.concat(group)
+                merged.append(ticks.iloc[np.argsort(self._get_timestamps(ticks).values, kind='stable')])
+        return pd.concat(merged) if len(merged) > 1 else merged[0]
+
+    def _sort(self, ticks: pd.DataFrame) -> pd.DataFrame:
+        if self._is_sorted(ticks):
+            return ticks
+        # sort_index(level=...) ignores kind and so may reorder ticks with the same timestamp
+        return ticks.iloc[np.argsort(self._get_timestamps(ticks).values, kind='stable')]
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.read_workers <= 1:
+            return None
+        if self.executor is None:
+            if self.read_executor == 'process':
+                self.executor = ProcessPoolExecutor(max_workers=self.read_workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix='splay-reader')
+        return self.executor
+
+    def _get_timestamps(self, ticks: pd.DataFrame) -> pd.Index:
+        return ticks.index.get_level_values(self.timestamp_column)
+
+    def _is_sorted(self, ticks: pd.DataFrame) -> bool:
+        return self._get_timestamps(ticks).is_monotonic_increasing
+
     def _check_closed(self, operation):
         if self.closed:
             raise Exception('unable to perform operation while closed: ' + operation)
 
 
-class AzureBlobTickstore(Tickstore):
+class AzureBlobTickstore(LocalTickstore):
     """
-    Tickstore meant to run against Microsoft's Azure Blob Storage backend, e.g. for archiving purposes. Note this is
-    not suitable for concurrent access to the blob because the index is loaded into memory on the local node and only
-    written back to the blob on close. We may want to implement blob locking to at least prevent accidents.
+    Tickstore meant to run against Microsoft's Azure Blob Storage backend, e.g. for archiving purposes. The blob
+    container holds the same YYYY/MM/DD splay layout and index files as a LocalTickstore, and cache_path acts as a
+    read-through disk cache in front of it: the index gets downloaded on open, splays get downloaded on first
+    select, all of a select's missing splays at once, and new splays are written to the cache and then uploaded
+    on flush, again as one batch. Transfers move files in chunks on a pool of transfer_workers threads.
+
+    Note this is not suitable for concurrent access to the blob because the index is loaded into memory on the
+    local node and only written back to the blob on flush. We may want to implement blob locking to at least
+    prevent accidents.
     """
 
+    logger = logging.getLogger(__name__)
+
+    index_files = ['index.h5', 'index.log']
+
+    def __init__(self, container: BlobContainer, cache_path: Path, timestamp_column: str = 'date',
+                 splay_format: Union[str, SplayFormat] = 'hdf5', read_workers: int = 1, read_executor: str = 'thread',
+                 splay_cache: Optional[SplayCache] = None, transfer_workers: int = DEFAULT_TRANSFER_WORKERS,
+                 chunk_size: int = DEFAULT_TRANSFER_CHUNK_SIZE):
+        self.container = container
+        self.transfer = BlobTransfer(container, chunk_size, transfer_workers)
+        self.pending_uploads = []
+
+        # the blob's copy of the index always wins over whatever is left in the cache
+        cache_path = cache_path.resolve()
+        for index_file in self.index_files:
+            local_path = cache_path.joinpath(index_file)
+            if local_path.exists():
+                local_path.unlink()
+        not_found = self.transfer.download([(index_file, cache_path.joinpath(index_file))
+                                            for index_file in self.index_files])
+        if 'index.h5' in not_found and cache_path.exists():
+            # a new container: don't let stale splays in the cache get indexed
+            self.logger.warning(f'no index in blob container, clearing cache {cache_path}')
+            self._clear_cache(cache_path)
+        self.index_state = self._get_index_state(cache_path)
+
+        super().__init__(cache_path, timestamp_column, splay_format, read_workers, read_executor, splay_cache)
+
+    def reindex(self, incremental: bool = False):
+        """
+        Rebuilds the index from the splays in the blob container, as the cache may only hold some of them. Blob
+        last-modified times stand in for file mtimes in dating the versions; a listing has no directory mtimes
+        to compare, so an incremental reindex is a full one.
+        """
+        self._check_closed('reindex')
+
+        # get any splays only written to the cache so far into the container first
+        self.flush()
+
+        splays = []
+        for name, last_modified in self.container.list_blobs_modified():
+            parts = name.split('/')
+            if len(parts) != 4 or not all(part.isdigit() for part in parts[:3]) \
+                    or not parts[3].endswith(tuple(SPLAY_EXTENSIONS)):
+                continue
+            symbol, symbol_version = _parse_splay_name(parts[3])
+            splay_date = datetime.date(int(parts[0]), int(parts[1]), int(parts[2]))
+            splays.append((symbol, splay_date, symbol_version, self._get_cache_path(name), last_modified))
+        self.logger.info(f'rebuilding index from {len(splays)} splays in blob container')
+        self.index.rebuild(splays)
+        if self.splay_cache is not None:
+            self.splay_cache.clear(str(self.base_path))
+        self.flush()
+
+    def destroy(self):
+        for name in self.container.list_blobs():
+            self.container.delete_blob(name)
+        self.pending_uploads = []
+        super().destroy()
+
+    def flush(self):
+        super().flush()
+
+        # upload splays before the index which refers to them
+        if len(self.pending_uploads) > 0:
+            self.logger.info(f'uploading {len(self.pending_uploads)} splays')
+            self.transfer.upload(self.pending_uploads)
+            self.pending_uploads = []
+
+        index_state = self._get_index_state(self.base_path)
+        if index_state != self.index_state:
+            changed = [index_file for index_file in self.index_files
+                       if index_state[index_file] not in (None, self.index_state[index_file])]
+            self.transfer.upload([(self.base_path.joinpath(index_file), index_file) for index_file in changed])
+
+            # a checkpoint folds the log back into index.h5
+            for index_file in self.index_files:
+                if index_state[index_file] is None and self.index_state[index_file] is not None:
+                    self.container.delete_blob(index_file)
+            self.index_state = index_state
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            super().close()
+            self.transfer.close()
+
+    def _publish_splay(self, tmp_path: Path, write_path: Path):
+        super()._publish_splay(tmp_path, write_path)
+        self.pending_uploads.append((write_path, self._get_blob_name(write_path)))
+
+    def export_versions(self, symbol: str, as_at_date: datetime.date) -> List[SplayVersion]:
+        splay_versions = [SplayVersion(splay_version.version, splay_version.start_time, splay_version.end_time,
+                                       self._get_cache_path(splay_version.path))
+                          for splay_version in super().export_versions(symbol, as_at_date)]
+        self._fetch_splays([splay_version.path for splay_version in splay_versions])
+        return splay_versions
+
+    def _remove_splays(self, splay_paths: List[Path]):
+        removed = {self._get_blob_name(splay_path) for splay_path in splay_paths}
+        self.pending_uploads = [(path, name) for path, name in self.pending_uploads if name not in removed]
+        for name in removed:
+            if self.container.get_blob_size(name) is not None:
+                self.container.delete_blob(name)
+        super()._remove_splays([Path(self._get_cache_path(splay_path)) for splay_path in splay_paths])
+
+    def _load_splays(self, selected: pd.DataFrame, start: datetime.datetime, end: datetime.datetime,
+                     columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        # the index may have been written from another cache directory, so splays are located by blob name
+        selected = selected.copy()
+        selected['path'] = [self._get_cache_path(path) for path in selected['path']]
+        self._fetch_splays(selected['path'].tolist())
+        return super()._load_splays(selected, start, end, columns)
+
+    def _fetch_splays(self, paths: List[str]):
+        missing = [(self._get_blob_name(path), Path(path)) for path in paths if not os.path.exists(path)]
+        if len(missing) > 0:
+            self.logger.info(f'downloading {len(missing)} splays into {self.base_path}')
+            not_found = self.transfer.download(missing)
+            if len(not_found) > 0:
+                raise IOError(f'splays missing from blob container: {not_found}')
+
+    @staticmethod
+    def _clear_cache(cache_path: Path):
+        # only remove what a tickstore would have put there, i.e. the index files and YYYY/MM/DD splays, in case
+        # the cache got pointed at a directory which holds anything else
+        for index_path in cache_path.glob('index.*'):
+            if index_path.is_file():
+                index_path.unlink()
+        for day_path in list(cache_path.glob('[0-9]' * 4 + '/' + '[0-9]' * 2 + '/' + '[0-9]' * 2)):
+            for splay_path in day_path.iterdir():
+                if splay_path.is_file() and SPLAY_FILENAME_PATTERN.match(splay_path.name):
+                    splay_path.unlink()
+            for dir_path in [day_path, day_path.parent, day_path.parent.parent]:
+                if dir_path.exists() and not any(dir_path.iterdir()):
+                    dir_path.rmdir()
+
+    def _get_cache_path(self, path: Union[str, Path]) -> str:
+        return str(self.base_path.joinpath(self._get_blob_name(path)))
+
+    @staticmethod
+    def _get_blob_name(path: Union[str, Path]) -> str:
+        # YYYY/MM/DD/SYMBOL_VERSION.ext
+        return '/'.join(Path(path).parts[-4:])
+
+    def _get_index_state(self, base_path: Path) -> Dict[str, Optional[Tuple[int, int]]]:
+        index_state = {}
+        for index_file in self.index_files:
+            index_path = base_path.joinpath(index_file)
+            if index_path.exists():
+                stat = index_path.stat()
+                index_state[index_file] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                index_state[index_file] = None
+        return index_state
+
+
+class TieredTickstore(Tickstore):
+    """
+    Tickstore spanning a hot tier, e.g. a LocalTickstore, which holds the last hot_days days, and a cold tier,
+    e.g. an AzureBlobTickstore archive, which holds everything older. Every (symbol, date) is served by one tier,
+    the hot one if both have it, so selects get routed by date and the ticks from both tiers merged.
+
+    migrate() moves the dates which have aged out of the hot tier into the cold one, with all their versions,
+    so as-of queries give the same results before and after. start_migration() runs it periodically on a
+    background thread; each date moves under a lock, so selects never see it half-moved.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, hot: LocalTickstore, cold: LocalTickstore, hot_days: int = DEFAULT_HOT_DAYS):
+        self.hot = hot
+        self.cold = cold
+        self.hot_days = hot_days
+        self.lock = threading.RLock()
+        self.migration_thread = None
+        self.migration_stopped = threading.Event()
+        self.closed = False
+
     def select(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
-               as_of_time: datetime.datetime = BiTimestamp.latest_as_of) -> pd.DataFrame:
-        raise NotImplementedError
+               as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
+        self._check_closed('select')
+        return self._select(symbol, None, start, end, as_of_time, columns)
+
+    def select_dates(self, symbol: str, dates: Collection[datetime.date], start: datetime.datetime,
+                     end: datetime.datetime, as_of_time: datetime.datetime = BiTimestamp.latest_as_of,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        self._check_closed('select_dates')
+        return self._select(symbol, set(dates), start, end, as_of_time, columns)
 
     def insert(self, symbol: str, ts: BiTimestamp, ticks: pd.DataFrame):
-        raise NotImplementedError
+        self._check_closed('insert')
+        with self.lock:
+            self._get_tier(symbol, ts.as_at_date).insert(symbol, ts, ticks)
 
     def delete(self, symbol: str, ts: BiTimestamp):
-        raise NotImplementedError
+        self._check_closed('delete')
+        with self.lock:
+            self._get_tier(symbol, ts.as_at_date).delete(symbol, ts)
+
+    def migrate(self, cutoff_date: Optional[datetime.date] = None) -> int:
+        """
+        Moves every date before cutoff_date, by default hot_days ago, from the hot tier to the cold one.
+        :return: the number of (symbol, date) moved
+        """
+        if cutoff_date is None:
+            cutoff_date = datetime.datetime.utcnow().date() - datetime.timedelta(days=self.hot_days)
+        with self.lock:
+            aged_out = [(symbol, as_at_date) for symbol, symbol_index in self.hot.index.symbols.items()
+                        for as_at_date in symbol_index.dates if as_at_date < cutoff_date]
+
+        moved = 0
+        for symbol, as_at_date in aged_out:
+            if self.migration_stopped.is_set():
+                break
+            with self.lock:
+                self._move(symbol, as_at_date, self.hot, self.cold)
+            moved += 1
+        if moved > 0:
+            self.logger.info(f'migrated {moved} dates older than {cutoff_date} to the cold tier')
+        return moved
+
+    def start_migration(self, interval: float = DEFAULT_MIGRATION_INTERVAL):
+        """
+        Starts migrating aged-out dates every interval seconds on a background thread until closed.
+        """
+        def run_migration():
+            while not self.migration_stopped.is_set():
+                try:
+                    self.migrate()
+                except Exception:
+                    self.logger.exception('tickstore migration failed')
+                self.migration_stopped.wait(interval)
+
+        if self.migration_thread is None:
+            self.migration_thread = threading.Thread(target=run_migration, name='tickstore-migration', daemon=True)
+            self.migration_thread.start()
 
     def flush(self):
-        pass
+        with self.lock:
+            self.hot.flush()
+            self.cold.flush()
 
     def close(self):
-        pass
+        if not self.closed:
+            if self.migration_thread is not None:
+                self.migration_stopped.set()
+                self.migration_thread.join()
+                self.migration_thread = None
+            self.hot.close()
+            self.cold.close()
+            self.closed = True
 
     def destroy(self):
-        pass
+        self.hot.destroy()
+        self.cold.destroy()
+
+    def _select(self, symbol: str, dates: Optional[set], start: datetime.datetime, end: datetime.datetime,
+                as_of_time: datetime.datetime, columns: Optional[List[str]]) -> pd.DataFrame:
+        with self.lock:
+            tiers = []
+            for tickstore, selected in self._route(symbol, start, end, as_of_time):
+                tier_dates = {as_at_date.date() for as_at_date in selected.index.get_level_values('date')}
+                if dates is not None:
+                    tier_dates &= dates
+                if len(tier_dates) > 0:
+                    ticks = tickstore.select_dates(symbol, tier_dates, start, end, as_of_time, columns)
+                    tiers.append((min(tier_dates), ticks))
+        if len(tiers) == 0:
+            return pd.DataFrame()
+
+        # each tier's ticks are sorted, so in order of their dates they only need merging where they overlap
+        tiers.sort(key=lambda tier: tier[0])
+        merged = list(self._merge_days(ticks for _, ticks in tiers))
+        if len(merged) == 0:
+            return tiers[0][1]
+        return pd.concat(merged) if len(merged) > 1 else merged[0]
+
+    def _route(self, symbol: str, start: datetime.datetime, end: datetime.datetime,
+               as_of_time: datetime.datetime) -> List[Tuple[LocalTickstore, pd.DataFrame]]:
+        routed = []
+        hot_selected = self.hot.index.select(symbol, start.date(), end.date(), as_of_time)
+        if not hot_selected.empty:
+            routed.append((self.hot, hot_selected))
+
+        cold_selected = self.cold.index.select(symbol, start.date(), end.date(), as_of_time)
+        if not cold_selected.empty:
+            # a date left in both tiers by an interrupted migration is still served by the hot tier, as are
+            # dates which are deleted in the hot tier
+            hot_dates = set(self.hot.index.symbols[symbol].dates) if symbol in self.hot.index.symbols else set()
+            cold_dates = [as_at_date.date() for as_at_date in cold_selected.index.get_level_values('date')]
+            cold_selected = cold_selected.loc[[as_at_date not in hot_dates for as_at_date in cold_dates]]
+            if not cold_selected.empty:
+                routed.append((self.cold, cold_selected))
+        return routed
+
+    def _get_tier(self, symbol: str, as_at_date: datetime.date) -> LocalTickstore:
+        # dates stay in whichever tier has them, new ones go to the hot tier unless they're already aged out
+        if len(self.hot.index.get_versions(symbol, as_at_date)) > 0:
+            return self.hot
+        elif len(self.cold.index.get_versions(symbol, as_at_date)) > 0:
+            return self.cold
+        elif as_at_date < datetime.datetime.utcnow().date() - datetime.timedelta(days=self.hot_days):
+            return self.cold
+        else:
+            return self.hot
+
+    @staticmethod
+    def _move(symbol: str, as_at_date: datetime.date, source: LocalTickstore, target: LocalTickstore):
+        # the copy is made durable before the source is removed, so if interrupted the date is left in both tiers
+        # rather than in neither, and the next migration picks it up again
+        target.import_versions(symbol, as_at_date, source.export_versions(symbol, as_at_date))
+        target.flush()
+        source.remove(symbol, BiTimestamp(as_at_date))
+
+    def _check_closed(self, operation):
+        if self.closed:
+            raise Exception('unable to perform operation while closed: ' + operation)
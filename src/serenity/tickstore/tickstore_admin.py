@@ -5,10 +5,14 @@ import fire
 from serenity.tickstore.tickstore import LocalTickstore
 
 
-def tickstore_admin(action: str, db: str, staging_dir: str = '/mnt/raid/data/behemoth/db'):
+def tickstore_admin(action: str, db: str, staging_dir: str = '/mnt/raid/data/behemoth/db', incremental: bool = False):
     if action == 'reindex':
         tickstore = LocalTickstore(Path(f'{staging_dir}/{db}'), timestamp_column='time')
-        tickstore.reindex()
+        tickstore.reindex(incremental)
+        tickstore.close()
+    elif action == 'checkpoint':
+        tickstore = LocalTickstore(Path(f'{staging_dir}/{db}'), timestamp_column='time')
+        tickstore.index.checkpoint()
         tickstore.close()
     else:
         raise Exception(f'Unknown action: {action}')
@@ -0,0 +1,226 @@
+import datetime
+import json
+import logging
+import platform
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import fire
+import numpy as np
+import pandas as pd
+
+from serenity.tickstore.tickstore import BiTimestamp, LocalTickstore
+
+
+# (name, length) of the select ranges benchmarked, each ending at the end of the generated data
+SELECT_RANGES = [
+    ('1h', datetime.timedelta(hours=1)),
+    ('1d', datetime.timedelta(days=1)),
+    ('1w', datetime.timedelta(weeks=1))
+]
+
+
+def generate_trades(symbol: str, trade_date: datetime.date, trades_per_day: int, start_price: float = 10000.0,
+                    volatility: float = 0.02, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Generates a day of synthetic trades in the same layout as the trades uploaded by behemoth_upload: Poisson
+    arrival times, which makes for bursts and sub-second gaps like real prints, with more trading during the
+    day than at night, a geometric random walk with the given daily volatility for prices and log-normal sizes.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(rng.poisson(trades_per_day))
+
+    # arrival times sorted into a day, thinned overnight by sampling the hour from an intraday profile
+    hour_weights = 1.0 + 0.5 * np.sin(np.linspace(-np.pi / 2, 3 * np.pi / 2, 24))
+    hours = rng.choice(24, size=n, p=hour_weights / hour_weights.sum())
+    offsets_ns = np.sort(hours * 3600 * 10 ** 9 + rng.integers(0, 3600 * 10 ** 9, size=n))
+    times = pd.Timestamp(trade_date).value + offsets_ns
+
+    log_returns = rng.normal(0.0, volatility / np.sqrt(max(n, 1)), size=n)
+    prices = np.round(start_price * np.exp(np.cumsum(log_returns)), 2)
+    sizes = np.round(rng.lognormal(-3.0, 1.5, size=n), 8)
+    first_id = int(rng.integers(0, 10 ** 9))
+
+    trades = pd.DataFrame({
+        'time': pd.to_datetime(times),
+        'sequence': np.arange(first_id, first_id + n, dtype=np.int64),
+        'trade_id': np.arange(first_id, first_id + n, dtype=np.int64),
+        'product_id': symbol,
+        'side': np.where(rng.random(n) < 0.5, 'buy', 'sell'),
+        'size': sizes,
+        'price': prices
+    })
+    trades.set_index('time', inplace=True)
+    return trades
+
+
+class TickstoreBenchmark:
+    """
+    Times the main LocalTickstore operations over synthetic trades: inserting days of trades for several
+    symbols, selecting ranges of several lengths, and opening, flushing, checkpointing and reindexing the index.
+    Every timing is the best of `repeat` runs, and results are kept as a list of flat records so runs with
+    different splay formats or code changes can be compared with compare_results().
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, base_path: Path, symbols: int = 10, days: int = 7, trades_per_day: int = 1000000,
+                 splay_format: str = 'hdf5', repeat: int = 3, seed: int = 42):
+        self.base_path = base_path
+        self.symbols = [f'SYM{ndx:03d}-USD' for ndx in range(symbols)]
+        self.days = days
+        self.trades_per_day = trades_per_day
+        self.splay_format = splay_format
+        self.repeat = repeat
+        self.seed = seed
+        self.start_date = datetime.date(2019, 10, 1)
+        self.results = []
+
+    def run(self) -> List[dict]:
+        db_path = self.base_path.joinpath(f'BENCHMARK_{self.splay_format.upper()}')
+        if db_path.exists():
+            shutil.rmtree(db_path)
+        try:
+            self._benchmark_insert(db_path)
+            self._benchmark_select(db_path)
+            self._benchmark_index(db_path)
+        finally:
+            if db_path.exists():
+                shutil.rmtree(db_path)
+        return self.results
+
+    def _benchmark_insert(self, db_path: Path):
+        tickstore = LocalTickstore(db_path, 'time', self.splay_format)
+        rows = 0
+        elapsed = 0.0
+        for day in range(self.days):
+            trade_date = self.start_date + datetime.timedelta(days=day)
+            for ndx, symbol in enumerate(self.symbols):
+                trades = generate_trades(symbol, trade_date, self.trades_per_day,
+                                         seed=self.seed + day * len(self.symbols) + ndx)
+                start = time.perf_counter()
+                tickstore.insert(symbol, BiTimestamp(trade_date), trades)
+                elapsed += time.perf_counter() - start
+                rows += len(trades)
+        tickstore.close()
+
+        disk_bytes = sum(path.stat().st_size for path in db_path.rglob('*') if path.is_file())
+        self._record('insert', elapsed, rows=rows, splays=self.days * len(self.symbols), disk_bytes=disk_bytes)
+
+    def _benchmark_select(self, db_path: Path):
+        tickstore = LocalTickstore(db_path, 'time', self.splay_format)
+        symbol = self.symbols[0]
+        end = datetime.datetime.combine(self.start_date + datetime.timedelta(days=self.days - 1), datetime.time.max)
+        for range_name, range_length in SELECT_RANGES:
+            if range_length > datetime.timedelta(days=self.days):
+                continue
+            start = end - range_length
+            seconds, ticks = self._time(lambda: tickstore.select(symbol, start, end))
+            self._record(f'select_{range_name}', seconds, rows=len(ticks))
+            seconds, ticks = self._time(lambda: tickstore.select(symbol, start, end, columns=['price']))
+            self._record(f'select_{range_name}_price', seconds, rows=len(ticks))
+        tickstore.close()
+
+    def _benchmark_index(self, db_path: Path):
+        # every insert so far only got appended to the index log, so opening replays all of it
+        seconds, tickstore = self._time(lambda: LocalTickstore(db_path, 'time', self.splay_format), repeat=1)
+        self._record('index_open_log', seconds, entries=tickstore.index.log_entries)
+
+        tickstore.insert(self.symbols[0], BiTimestamp(self.start_date), generate_trades(
+            self.symbols[0], self.start_date, 1000, seed=self.seed))
+        seconds, _ = self._time(tickstore.flush, repeat=1)
+        self._record('index_flush', seconds)
+        seconds, _ = self._time(tickstore.index.checkpoint)
+        self._record('index_checkpoint', seconds, splays=len(tickstore.index.df))
+        tickstore.close()
+
+        seconds, _ = self._time(lambda: LocalTickstore(db_path, 'time', self.splay_format).close())
+        self._record('index_open', seconds)
+        tickstore = LocalTickstore(db_path, 'time', self.splay_format)
+        seconds, _ = self._time(tickstore.reindex)
+        self._record('reindex', seconds)
+        seconds, _ = self._time(lambda: tickstore.reindex(incremental=True))
+        self._record('reindex_incremental', seconds)
+        tickstore.close()
+
+    def _time(self, func: Callable, repeat: Optional[int] = None) -> tuple:
+        best = None
+        result = None
+        for _ in range(self.repeat if repeat is None else repeat):
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, result
+
+    def _record(self, benchmark: str, seconds: float, **measures):
+        result = {
+            'benchmark': benchmark,
+            'splay_format': self.splay_format,
+            'symbols': len(self.symbols),
+            'days': self.days,
+            'trades_per_day': self.trades_per_day,
+            'seconds': seconds
+        }
+        result.update(measures)
+        if 'rows' in measures and seconds > 0:
+            result['rows_per_second'] = measures['rows'] / seconds
+        self.logger.info(f'{benchmark} ({self.splay_format}): {seconds:.4f}s {measures}')
+        self.results.append(result)
+
+
+def run_benchmarks(output: Path, base_path: Path, splay_formats: List[str], **benchmark_args) -> dict:
+    """
+    Runs the tickstore benchmarks for every splay format and writes the results, along with the environment
+    they were measured in, as JSON to the output path.
+    """
+    results = []
+    for splay_format in splay_formats:
+        results.extend(TickstoreBenchmark(base_path, splay_format=splay_format, **benchmark_args).run())
+    report = {
+        'timestamp': datetime.datetime.utcnow().isoformat(),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    return report
+
+
+def compare_results(baseline: Path, current: Path) -> pd.DataFrame:
+    """
+    Lines up the timings of two benchmark runs by benchmark and splay format; a ratio below 1 is a speedup.
+    """
+    def load(path: Path) -> pd.DataFrame:
+        results = pd.DataFrame(json.loads(path.read_text())['results'])
+        return results.set_index(['benchmark', 'splay_format'])['seconds']
+
+    comparison = pd.DataFrame({'baseline': load(baseline), 'current': load(current)})
+    comparison['ratio'] = comparison['current'] / comparison['baseline']
+    return comparison
+
+
+def tickstore_benchmark(action: str = 'run', output: str = 'tickstore_benchmark.json', baseline: Optional[str] = None,
+                        base_path: str = '/tmp', splay_formats: tuple = ('hdf5', 'parquet'), symbols: int = 10,
+                        days: int = 7, trades_per_day: int = 1000000, repeat: int = 3):
+    # imported here rather than at the top so the benchmarks themselves can be run without tau
+    from serenity.utils import init_logging
+
+    init_logging()
+    logger = logging.getLogger(__name__)
+    if action == 'run':
+        run_benchmarks(Path(output), Path(base_path), list(splay_formats), symbols=symbols, days=days,
+                       trades_per_day=trades_per_day, repeat=repeat)
+    elif action == 'compare':
+        logger.info(f'{output} compared to {baseline}:\n{compare_results(Path(baseline), Path(output)).to_string()}')
+    else:
+        raise Exception(f'Unknown action: {action}')
+
+
+if __name__ == '__main__':
+    fire.Fire(tickstore_benchmark)
@@ -0,0 +1,36 @@
+import os
+import shutil
+
+from serenity.tickstore.blob import BlobTransfer, DirectoryBlobContainer
+from pathlib import Path
+
+
+def test_blob_transfer():
+    container = DirectoryBlobContainer(Path('tmp/container'))
+    transfer = BlobTransfer(container, chunk_size=1000, workers=4)
+    files = []
+    for ndx, size in enumerate([0, 999, 1000, 12345]):
+        path = Path(f'tmp/upload/file_{ndx}.bin')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(size))
+        files.append((path, f'2019/10/01/file_{ndx}.bin'))
+    transfer.upload(files)
+    assert sorted(name for _, name in files) == container.list_blobs()
+    assert sorted(name for _, name in files) == [name for name, _ in container.list_blobs_modified('2019/')]
+    assert 12345 == container.get_blob_size('2019/10/01/file_3.bin')
+    assert [] == os.listdir('tmp/container/.blocks')
+
+    missing = transfer.download([(name, Path('tmp/download').joinpath(name)) for _, name in files] +
+                                [('2019/10/02/missing.bin', Path('tmp/download/missing.bin'))])
+    assert ['2019/10/02/missing.bin'] == missing
+    for path, name in files:
+        assert path.read_bytes() == Path('tmp/download').joinpath(name).read_bytes()
+    assert not Path('tmp/download/missing.bin').exists()
+
+    container.delete_blob('2019/10/01/file_0.bin')
+    assert container.get_blob_size('2019/10/01/file_0.bin') is None
+    transfer.close()
+
+
+def teardown_function():
+    shutil.rmtree('tmp', ignore_errors=True)
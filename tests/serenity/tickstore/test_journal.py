@@ -1,7 +1,13 @@
 import datetime
+import struct
 import shutil
+import threading
+import time
 
-from serenity.tickstore.journal import Journal
+import pytest
+
+from serenity.tickstore.journal import Journal, RecordSchema, CommitPolicy, SealedJournalException, \
+    CorruptRecordException, JournalFramingException, OpenJournalException
 from pathlib import Path
 
 
@@ -31,5 +37,446 @@ def test_journal():
         assert i == reader.read_long()
 
 
+def test_journal_read_all():
+    journal = Journal(Path('tmp'))
+    appender = journal.create_appender()
+
+    for i in range(0, 1000):
+        appender.write_string('BTC-USD' if i < 500 else 'ETH-USDC')
+        appender.write_int(77571114)
+        appender.write_short(1)
+        appender.write_double(0.00452635)
+        appender.write_long(i)
+
+    appender.close()
+
+    schema = RecordSchema('test', [('symbol', 'string'), ('id', 'int'), ('side', 'short'), ('qty', 'double'),
+                                   ('seq', 'long')])
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    records = reader.read_all(schema)
+    assert 1000 == len(records)
+    assert b'BTC-USD' == records['symbol'][0]
+    assert b'ETH-USDC' == records['symbol'][-1]
+    assert (records['id'] == 77571114).all()
+    assert (records['side'] == 1).all()
+    assert (records['qty'] == 0.00452635).all()
+    assert list(range(0, 1000)) == records['seq'].tolist()
+    assert reader.get_pos() == reader.get_length() + 4
+    reader.close()
+
+    # same-sized records are decoded via a strided view over the whole segment
+    journal = Journal(Path('tmp/fixed'))
+    appender = journal.create_appender()
+    for i in range(0, 1000):
+        appender.write_string('BTC-USD')
+        appender.write_int(77571114)
+        appender.write_short(1)
+        appender.write_double(0.00452635)
+        appender.write_long(i)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    records = reader.read_all(schema)
+    assert (records['symbol'] == b'BTC-USD').all()
+    assert list(range(0, 1000)) == records['seq'].tolist()
+    reader.close()
+
+
+def test_journal_views():
+    schema = RecordSchema('trade', [('time', 'double'), ('symbol', 'string'), ('seq', 'long')], timestamp_field='time')
+    journal = Journal(Path('tmp'))
+    journal.register_schema(schema)
+    appender = journal.create_appender()
+    for i in range(0, 100):
+        appender.append_record('trade', 1589000000.0 + i, 'BTC-USD', i)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 1589000000.0 == reader.read_double()
+    assert 'BTC-USD' == reader.read_string()
+    assert 0 == reader.read_long()
+
+    records = reader.view_records(schema)
+    assert 99 == len(records)
+    assert not records.flags.writeable
+    assert b'BTC-USD' == records['symbol'][0]
+    assert list(range(1, 100)) == records['seq'].tolist()
+    assert 1589000001.0 == reader.view_array('=f8', count=1)[0]
+    with reader.view(end=reader.get_pos() + 8) as view:
+        assert (1589000001.0,) == struct.unpack('=d', view)
+
+    # views pin the mapping until released
+    with pytest.raises(BufferError):
+        reader.close()
+    del records
+    reader.close()
+
+    appender = journal.create_appender()
+    appender.append_record('trade', 1589000100.0, 'ETH-USDC', 100)
+    appender.close()
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    with pytest.raises(ValueError):
+        reader.view_records(schema)
+    reader.close()
+
+
+def test_journal_records():
+    journal = Journal(Path('tmp'))
+    journal.register_schema(RecordSchema('trade', [('time', 'double'), ('trade_id', 'long'), ('symbol', 'string'),
+                                                   ('side', 'short'), ('qty', 'double'), ('price', 'double')]))
+    appender = journal.create_appender()
+
+    for i in range(0, 1000):
+        appender.append_record('trade', 1589000000.5, i, 'BTC-USD', 1, 0.00452635, 8797.78)
+    appender.write_string('X' * 200)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 42202 == reader.get_length()
+
+    for i in range(0, 1000):
+        assert (1589000000.5, i, 'BTC-USD', 1, 0.00452635, 8797.78) == reader.read_record('trade')
+    assert 'X' * 200 == reader.read_string()
+
+
+def test_journal_commit_policy():
+    journal = Journal(Path('tmp'), commit_policy=CommitPolicy.every_n_records(10))
+    appender = journal.create_appender()
+    for i in range(0, 15):
+        appender.write_long(i)
+
+    # only the first ten values have been committed
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 80 == reader.get_length()
+    reader.close()
+
+    # simulate a crash by unmapping without committing, then recover
+    appender.mm.close()
+    appender.mm = None
+    journal.commit_policy = CommitPolicy.manual()
+    appender = journal.create_appender()
+    appender.write_long(10)
+    appender.write_long(11)
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 80 == reader.get_length()
+    reader.close()
+
+    appender.commit()
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 96 == reader.get_length()
+    for i in range(0, 12):
+        assert i == reader.read_long()
+    assert 96 == reader.get_length()
+    appender.close()
+
+
+def test_journal_tail():
+    schema = RecordSchema('tick', [('seq', 'long')])
+    journal = Journal(Path('tmp'))
+    journal.register_schema(schema)
+
+    # an appender opened on yesterday's journal rolls over to today's on its first append
+    today = datetime.datetime.utcnow().date()
+    yesterday = today - datetime.timedelta(days=1)
+    appender = journal.create_appender(yesterday)
+    reader = journal.create_reader(yesterday)
+    ticks = reader.tail('tick', spin_count=0, max_sleep=0.001)
+
+    for i in range(0, 5):
+        appender.append_record('tick', i)
+
+    # the reader follows it to today's journal once caught up with yesterday's
+    assert [(i,) for i in range(0, 5)] == [next(ticks) for _ in range(0, 5)]
+    assert today == reader.current_date
+
+    appender.append_record('tick', 5)
+    assert (5,) == next(ticks)
+
+    ticks.close()
+    appender.close()
+    reader.close()
+
+
+def test_journal_seek_time():
+    journal = Journal(Path('tmp'), index_interval=100)
+    journal.register_schema(RecordSchema('trade', [('time', 'double'), ('symbol', 'string'), ('seq', 'long')],
+                                         timestamp_field='time'))
+    appender = journal.create_appender()
+    for i in range(0, 1000):
+        appender.append_record('trade', 1589000000.0 + i, 'BTC-USD', i)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    reader.seek_time(1589000000.0 + 550.5, 'trade')
+    assert (1589000551.0, 'BTC-USD', 551) == reader.read_record('trade')
+
+    reader.seek_time(1589000000.0 - 1, 'trade')
+    assert 0 == reader.read_record('trade')[2]
+
+    reader.seek_time(1589000000.0 + 5000, 'trade')
+    assert reader.get_pos() == reader.get_length() + 4
+    reader.close()
+
+    # index entries past the committed length are dropped on recovery
+    appender = journal.create_appender()
+    appender.mm.pos = 4
+    appender.commit()
+    appender.close()
+    appender = journal.create_appender()
+    appender.append_record('trade', 1589000000.0 + 5000, 'ETH-USD', 0)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    reader.seek_time(1589000000.0 + 550.5, 'trade')
+    assert (1589005000.0, 'ETH-USD', 0) == reader.read_record('trade')
+    reader.close()
+
+
+def test_journal_multiplexed():
+    schema = RecordSchema('trade', [('time', 'double'), ('instrument_id', 'int'), ('price', 'double')],
+                          key_field='instrument_id')
+    journal = Journal(Path('tmp'))
+    journal.register_schema(schema)
+    appender = journal.create_appender()
+    for i in range(0, 1000):
+        appender.append_record('trade', 1589000000.0 + i, i % 3, 8797.78 + i)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    trades = reader.read_all(schema, keys=[1])
+    assert 333 == len(trades)
+    assert (trades['instrument_id'] == 1).all()
+    reader.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    trades_by_id = reader.demultiplex(schema)
+    assert [0, 1, 2] == sorted(trades_by_id.keys())
+    assert 334 == len(trades_by_id[0])
+    assert list(range(2, 1000, 3)) == (trades_by_id[2]['time'] - 1589000000.0).astype(int).tolist()
+    reader.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    ticks = reader.tail('trade', keys={2})
+    assert (1589000002.0, 2, 8799.78) == next(ticks)
+    assert (1589000005.0, 2, 8802.78) == next(ticks)
+    ticks.close()
+    reader.close()
+
+
+def test_journal_compact():
+    journal = Journal(Path('tmp'), index_interval=100)
+    journal.register_schema(RecordSchema('trade', [('time', 'double'), ('symbol', 'string'), ('seq', 'long')],
+                                         timestamp_field='time'))
+    today = datetime.datetime.utcnow().date()
+    yesterday = today - datetime.timedelta(days=1)
+    for journal_date in [yesterday - datetime.timedelta(days=1), yesterday]:
+        # appenders always write to today's journal, so move it back in time to make a closed day
+        appender = journal.create_appender()
+        for i in range(0, 1000):
+            appender.append_record('trade', 1589000000.0 + i, 'BTC-USD', i)
+        appender.close()
+        # noinspection PyProtectedMember
+        journal._get_mmap_path(today).parent.rename(journal._get_mmap_path(journal_date).parent)
+    assert [yesterday - datetime.timedelta(days=1), yesterday] == journal.list_dates()
+
+    # truncate to the data length
+    journal.compact(yesterday - datetime.timedelta(days=1))
+    # noinspection PyProtectedMember
+    assert 24004 == journal._get_mmap_path(yesterday - datetime.timedelta(days=1)).stat().st_size
+
+    # replace with a compressed copy, read back transparently
+    journal.compact(yesterday, seal=True, block_size=1000)
+    # noinspection PyProtectedMember
+    assert not journal._get_mmap_path(yesterday).exists()
+    for journal_date in [yesterday - datetime.timedelta(days=1), yesterday]:
+        reader = journal.create_reader(journal_date)
+        assert 24000 == reader.get_length()
+        reader.seek_time(1589000000.0 + 550, 'trade')
+        assert (1589000550.0, 'BTC-USD', 550) == reader.read_record('trade')
+        reader.close()
+
+    with pytest.raises(SealedJournalException):
+        journal.create_appender(yesterday)
+
+
+def test_journal_compact_open():
+    journal = Journal(Path('tmp'))
+    yesterday = datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
+
+    # an appender which has not rolled over since midnight still has the day open
+    appender = journal.create_appender(yesterday)
+    with pytest.raises(OpenJournalException):
+        journal.compact(yesterday, seal=True)
+    # noinspection PyProtectedMember
+    assert journal._get_mmap_path(yesterday).exists()
+
+    # its next write rolls it over to today, which closes yesterday
+    appender.write_long(42)
+    journal.compact(yesterday, seal=True)
+    # noinspection PyProtectedMember
+    assert not journal._get_mmap_path(yesterday).exists()
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 42 == reader.read_long()
+    reader.close()
+
+
+def test_journal_checksums():
+    schema = RecordSchema('trade', [('time', 'double'), ('symbol', 'string'), ('seq', 'long')], timestamp_field='time')
+    journal = Journal(Path('tmp'), checksums=True, index_interval=100)
+    journal.register_schema(schema)
+    appender = journal.create_appender()
+    for i in range(0, 1000):
+        appender.append_record('trade', 1589000000.0 + i, 'BTC-USD', i)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 32000 == reader.get_length()
+    assert (1589000000.0, 'BTC-USD', 0) == reader.read_record('trade')
+    records = reader.read_all(schema)
+    assert ['time', 'symbol', 'seq'] == list(records.dtype.names)
+    assert list(range(1, 1000)) == records['seq'].tolist()
+    reader.close()
+
+    # tear the last record as if the process had crashed half-way through writing it
+    # noinspection PyProtectedMember
+    with journal._get_mmap_path(datetime.datetime.utcnow().date()).open(mode='r+b') as journal_file:
+        journal_file.seek(4 + 32000 - 6)
+        journal_file.write(b'\xff\xff')
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 999 == len(reader.read_all(schema))
+    reader.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    with pytest.raises(CorruptRecordException):
+        reader.seek_time(1589000000.0 + 999, 'trade')
+    reader.close()
+
+    # recovery drops the torn record and appends after the last good one
+    appender = journal.create_appender()
+    appender.append_record('trade', 1589000000.0 + 1000, 'BTC-USD', 1000)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    records = reader.read_all(schema)
+    assert list(range(0, 999)) + [1000] == records['seq'].tolist()
+    reader.close()
+
+
+def test_journal_checksums_zeroed_tail():
+    schema = RecordSchema('trade', [('time', 'double'), ('seq', 'long')], timestamp_field='time')
+    journal = Journal(Path('tmp'), checksums=True)
+    journal.register_schema(schema)
+    appender = journal.create_appender()
+    for i in range(0, 100):
+        appender.append_record('trade', 1589000000.0 + i, i)
+    appender.close()
+
+    # zero the last ten records as if their pages never made it to disk; empty frames would pass the CRC32
+    # noinspection PyProtectedMember
+    with journal._get_mmap_path(datetime.datetime.utcnow().date()).open(mode='r+b') as journal_file:
+        journal_file.seek(4 + 2400 - 240)
+        journal_file.write(bytes(240))
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert list(range(0, 90)) == reader.read_all(schema)['seq'].tolist()
+    reader.close()
+
+    appender = journal.create_appender()
+    assert 4 + 2160 == appender.mm.get_pos()
+    appender.append_record('trade', 1589000000.0 + 100, 100)
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert list(range(0, 90)) + [100] == reader.read_all(schema)['seq'].tolist()
+    reader.close()
+
+
+def test_journal_checksums_mismatch():
+    schema = RecordSchema('trade', [('time', 'double'), ('symbol', 'string'), ('seq', 'long')], timestamp_field='time')
+    journal = Journal(Path('tmp'))
+    journal.register_schema(schema)
+    appender = journal.create_appender()
+    for i in range(0, 100):
+        appender.append_record('trade', 1589000000.0 + i, 'BTC-USD', i)
+    appender.close()
+
+    # a plain journal must not be recovered, or read, as a checksummed one
+    checksummed_journal = Journal(Path('tmp'), checksums=True)
+    checksummed_journal.register_schema(schema)
+    with pytest.raises(JournalFramingException):
+        checksummed_journal.create_appender()
+    with pytest.raises(JournalFramingException):
+        checksummed_journal.create_reader(datetime.datetime.utcnow().date())
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 2400 == reader.get_length()
+    assert list(range(0, 100)) == reader.read_all(schema)['seq'].tolist()
+    reader.close()
+
+    # nor a checksummed journal as a plain one
+    shutil.rmtree('tmp')
+    appender = checksummed_journal.create_appender()
+    appender.append_record('trade', 1589000000.0, 'BTC-USD', 0)
+    appender.close()
+    with pytest.raises(JournalFramingException):
+        journal.create_appender()
+    with pytest.raises(JournalFramingException):
+        journal.create_reader(datetime.datetime.utcnow().date())
+
+
+def test_journal_growth():
+    journal = Journal(Path('tmp'), max_size=1024)
+    appender = journal.create_appender()
+    for i in range(0, 1000):
+        appender.write_long(i)
+
+    # the appender grows the file in place instead of re-opening it
+    assert 8192 == appender.max_size
+    appender.close()
+
+    reader = journal.create_reader(datetime.datetime.utcnow().date())
+    assert 8000 == reader.get_length()
+    for i in range(0, 1000):
+        assert i == reader.read_long()
+    reader.close()
+
+
+def test_journal_precreate():
+    journal = Journal(Path('tmp'))
+    tomorrow = datetime.datetime.utcnow().date() + datetime.timedelta(days=1)
+    journal.precreate(tomorrow)
+
+    # the new journal file is sparse and starts out empty
+    # noinspection PyProtectedMember
+    journal_path = journal._get_mmap_path(tomorrow)
+    assert journal.max_size == journal_path.stat().st_size
+    assert journal_path.stat().st_blocks * 512 < journal.max_size
+    assert 0 == journal.create_reader(tomorrow).get_length()
+
+
+def test_journal_precreate_appenders():
+    # a lead of a day puts the precreation of tomorrow's journals at midnight just gone, so it is due at once
+    threads = threading.active_count()
+    journals = [Journal(Path(f'tmp/{i}'), precreate_lead=datetime.timedelta(days=1)) for i in range(0, 20)]
+    appenders = [journal.create_appender() for journal in journals]
+    assert threading.active_count() <= threads + 1
+
+    tomorrow = datetime.datetime.utcnow().date() + datetime.timedelta(days=1)
+    # noinspection PyProtectedMember
+    journal_paths = [journal._get_mmap_path(tomorrow) for journal in journals]
+    deadline = time.monotonic() + 10
+    while not all(journal_path.exists() for journal_path in journal_paths) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert all(journal_path.exists() for journal_path in journal_paths)
+
+    for appender in appenders:
+        appender.close()
+
+
 def teardown_function():
     shutil.rmtree('tmp', True)
@@ -0,0 +1,65 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from serenity.tickstore.rollup import Rollup, compute_ohlcv, get_rollup_db
+from serenity.tickstore.tickstore import LocalTickstore, BiTimestamp
+from pathlib import Path
+
+
+def test_rollup():
+    source = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column='time')
+    targets = {frequency: LocalTickstore(Path(f'./{get_rollup_db("COINBASE_PRO_TRADES", frequency)}'),
+                                         timestamp_column='time')
+               for frequency in ['1m', '5m']}
+    rollup = Rollup(source, targets)
+    try:
+        for day in [1, 2]:
+            source.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, day)), random_trades(day))
+        assert rollup.run() == 4
+
+        # bars match a direct resample of the trades
+        trades = source.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 1, 23, 59))
+        bars = targets['5m'].select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 1, 23, 59))
+        expected = trades['price'].resample('5T').ohlc().dropna()
+        assert np.allclose(bars[['open', 'high', 'low', 'close']].values, expected.values)
+        assert np.allclose(bars['volume'].values, trades['size'].resample('5T').sum()[expected.index].values)
+
+        # nothing to do once up to date
+        assert rollup.run() == 0
+
+        # a new version of a source day gets rolled up again
+        source.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_trades(1))
+        assert rollup.run() == 2
+        assert targets['1m'].index.get_versions('BTC-USD', datetime.date(2019, 10, 1))[-1].version == 1
+
+        # and deleting a source day deletes its rollups
+        source.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 2)))
+        assert rollup.run() == 2
+        assert targets['1m'].select('BTC-USD', datetime.datetime(2019, 10, 2),
+                                    datetime.datetime(2019, 10, 2, 23, 59)).empty
+        assert rollup.run() == 0
+    finally:
+        for tickstore in [source] + list(targets.values()):
+            tickstore.close()
+            tickstore.destroy()
+
+
+def test_compute_ohlcv():
+    index = pd.DatetimeIndex(['2019-10-01 00:00:10', '2019-10-01 00:00:50', '2019-10-01 00:02:30'], name='time')
+    trades = pd.DataFrame({'price': [10.0, 12.0, 11.0], 'size': [1.0, 2.0, 3.0]}, index=index)
+    bars = compute_ohlcv(trades, '1m')
+
+    # the empty 00:01 bar is skipped
+    assert list(bars.index) == [pd.Timestamp('2019-10-01 00:00'), pd.Timestamp('2019-10-01 00:02')]
+    assert list(bars.iloc[0]) == [10.0, 12.0, 10.0, 12.0, 3.0]
+    assert list(bars.iloc[1]) == [11.0, 11.0, 11.0, 11.0, 3.0]
+
+
+def random_trades(day):
+    start = pd.Timestamp(2019, 10, day).value // 10 ** 9
+    ts_index = pd.to_datetime(np.sort(np.random.randint(start, start + 6 * 60 * 60, 500)), unit='s')
+    ts_index.name = 'time'
+    return pd.DataFrame({'price': np.random.uniform(8000, 9000, 500), 'size': np.random.uniform(0, 1, 500)},
+                        index=ts_index)
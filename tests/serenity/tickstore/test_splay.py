@@ -0,0 +1,68 @@
+import datetime
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from serenity.tickstore.splay import HDF5SplayFormat, ParquetSplayFormat, SplayCache, get_splay_format_for_path
+from pathlib import Path
+
+
+@pytest.mark.parametrize('splay_format', [HDF5SplayFormat(), ParquetSplayFormat(row_group_size=100)])
+def test_splay_time_range(splay_format):
+    ts_index = pd.date_range('2019-10-01', periods=24 * 60, freq='1min', name='ts')
+    ticks = pd.DataFrame({'price': np.arange(len(ts_index), dtype=float), 'size': np.ones(len(ts_index))},
+                         index=ts_index)
+    path = Path('tmp').joinpath(f'BTC-USD_0000{splay_format.extension}')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    splay_format.write(path, ticks)
+    assert isinstance(get_splay_format_for_path(path), type(splay_format))
+
+    start = datetime.datetime(2019, 10, 1, 12, 0)
+    end = datetime.datetime(2019, 10, 1, 12, 59)
+    df = splay_format.read(path, columns=['price'], start=start, end=end)
+    assert ['price'] == list(df.columns)
+    assert 60 <= len(df) < len(ticks)
+    df = df.loc[(df.index >= start) & (df.index <= end)]
+    assert ticks.loc[start:end, 'price'].tolist() == df['price'].tolist()
+
+    # nothing in range
+    df = splay_format.read(path, start=datetime.datetime(2019, 10, 2, 12, 0))
+    assert 0 == len(df)
+
+    # unsorted splays may not be skipped through as efficiently, but must still return every tick in range
+    splay_format.write(path, ticks.iloc[::-1])
+    df = splay_format.read(path, start=start, end=end)
+    df = df.loc[(df.index >= start) & (df.index <= end)]
+    assert ticks.loc[start:end, 'price'].tolist() == df['price'].sort_index().tolist()
+
+
+def test_splay_cache_eviction():
+    ticks = pd.DataFrame({'price': np.arange(1000, dtype=float)})
+    size_bytes = int(ticks.memory_usage(index=True, deep=True).sum())
+    splay_cache = SplayCache(max_bytes=2 * size_bytes)
+
+    splay_cache.put('tmp/BTC-USD_0000.h5', 0, ticks)
+    splay_cache.put('tmp/ETH-USD_0000.h5', 0, ticks)
+    assert splay_cache.get('tmp/BTC-USD_0000.h5', 0) is ticks
+    splay_cache.put('tmp/XRP-USD_0000.h5', 0, ticks)
+
+    # ETH-USD was least recently used
+    assert 2 == len(splay_cache)
+    assert 2 * size_bytes == splay_cache.size_bytes
+    assert splay_cache.get('tmp/ETH-USD_0000.h5', 0) is None
+    assert splay_cache.get('tmp/BTC-USD_0000.h5', 1) is None
+    assert splay_cache.get('./tmp/BTC-USD_0000.h5', 0) is ticks
+
+    # too big to cache at all
+    splay_cache.put('tmp/BTC-USD_0001.h5', 1, pd.concat([ticks, ticks, ticks]))
+    assert splay_cache.get('tmp/BTC-USD_0001.h5', 1) is None
+
+    splay_cache.clear('tmp')
+    assert 0 == len(splay_cache)
+    assert 0 == splay_cache.size_bytes
+
+
+def teardown_function():
+    shutil.rmtree('tmp', ignore_errors=True)
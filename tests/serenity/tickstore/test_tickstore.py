@@ -1,8 +1,16 @@
 import datetime
+import shutil
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
+import pytest
 
-from serenity.tickstore.tickstore import LocalTickstore, BiTimestamp
+from serenity.tickstore.blob import DirectoryBlobContainer
+from serenity.tickstore.splay import SplayCache
+from serenity.tickstore.tickstore import AzureBlobTickstore, LocalTickstore, BiTimestamp, TieredTickstore
 from pathlib import Path
 
 
@@ -31,6 +39,7 @@ def test_tickstore():
     # because timestamps are random the number of matches is not deterministic. is there a better way to test this?
     df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 1), end=datetime.datetime(2019, 10, 15))
     assert df.size > 0
+    assert df.index.is_monotonic_increasing
 
     # create a 2nd version of all rows
     for i in range(31):
@@ -52,11 +61,521 @@ def test_tickstore():
     tickstore.destroy()
 
 
+def test_tickstore_parquet():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+
+    # version 0 in the original HDF5 format, version 1 as Parquet
+    ticks = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), ticks)
+    tickstore.close()
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name, splay_format='parquet')
+    df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 1), end=datetime.datetime(2019, 10, 31),
+                          columns=['A', 'C'])
+    assert ['A', 'C'] == list(df.columns)
+    assert len(ticks) == len(df)
+
+    ticks = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), ticks)
+    assert Path('./COINBASE_PRO_TRADES/2019/10/01/BTC-USD_0001.parquet').exists()
+    df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 1), end=datetime.datetime(2019, 10, 31),
+                          columns=['B'])
+    assert ['B'] == list(df.columns)
+    assert ts_col_name == df.index.name
+    assert ticks.sort_index(kind='mergesort')['B'].tolist() == df['B'].tolist()
+
+    # a rebuilt index picks up splays in both formats
+    tickstore.reindex()
+    df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 1), end=datetime.datetime(2019, 10, 31))
+    assert ticks.sort_index(kind='mergesort')['D'].tolist() == df['D'].tolist()
+
+    tickstore.close()
+    tickstore.destroy()
+
+
+@pytest.mark.parametrize('read_executor', ['thread', 'process'])
+def test_tickstore_parallel_select(read_executor):
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    for i in range(10):
+        ts_index = random_dates(pd.to_datetime(f'2019-10-{i + 1}'), pd.to_datetime(f'2019-10-{i + 2}'), 100)
+        ts_index.name = ts_col_name
+        ticks = pd.DataFrame(np.random.randint(0, 100, size=(100, 4)), columns=list('ABCD'), index=ts_index)
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), ticks)
+    expected = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 2, 12),
+                                end=datetime.datetime(2019, 10, 8, 12))
+    tickstore.close()
+
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name, read_workers=4,
+                               read_executor=read_executor)
+    df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 2, 12), end=datetime.datetime(2019, 10, 8, 12))
+    assert expected.equals(df)
+
+    days = list(tickstore.select_by_day('BTC-USD', start=datetime.datetime(2019, 10, 2, 12),
+                                        end=datetime.datetime(2019, 10, 8, 12)))
+    assert 7 == len(days)
+    assert all(day.index.is_monotonic_increasing for day in days)
+    assert expected.equals(pd.concat(days))
+
+    # stopping early leaves the pool usable
+    for _ in tickstore.select_by_day('BTC-USD', start=datetime.datetime(2019, 10, 1),
+                                     end=datetime.datetime(2019, 10, 31)):
+        break
+    assert expected.equals(tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 2, 12),
+                                            end=datetime.datetime(2019, 10, 8, 12)))
+
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_iter_select():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    for i in range(10):
+        # some ticks spill over past midnight into the next day
+        day = pd.to_datetime(f'2019-10-{i + 1}')
+        ts_index = random_dates(day, day + pd.Timedelta(hours=26), 100)
+        ts_index.name = ts_col_name
+        ticks = pd.DataFrame(np.random.randint(0, 100, size=(100, 4)), columns=list('ABCD'), index=ts_index)
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), ticks)
+
+    start = datetime.datetime(2019, 10, 2, 12)
+    end = datetime.datetime(2019, 10, 8, 12)
+    expected = tickstore.select('BTC-USD', start=start, end=end)
+    assert expected.index.is_monotonic_increasing
+    chunks = list(tickstore.iter_select('BTC-USD', start=start, end=end, chunk_rows=37))
+    assert all(len(chunk) == 37 for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= 37
+    df = pd.concat(chunks)
+    assert df.index.is_monotonic_increasing
+    assert expected.index.equals(df.index)
+    assert list(tickstore.iter_select('BTC-USD', start=datetime.datetime(2019, 11, 1),
+                                      end=datetime.datetime(2019, 11, 30))) == []
+
+    tickstore.close()
+    tickstore.destroy()
+
+
+@pytest.mark.parametrize('layout', ['long', 'wide'])
+def test_tickstore_select_many(layout):
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    symbols = ['BTC-USD', 'ETH-USD', 'BTCUSD']
+    for i in range(3):
+        for symbol in symbols:
+            day = pd.to_datetime(f'2019-10-{i + 1}')
+            ts_index = random_dates(day, day + pd.Timedelta(days=1), 100)
+            ts_index.name = ts_col_name
+            ticks = pd.DataFrame(np.random.randint(0, 100, size=(100, 2)), columns=list('AB'), index=ts_index)
+            tickstore.insert(symbol, BiTimestamp(day.date()), ticks)
+
+    start = datetime.datetime(2019, 10, 1, 6)
+    end = datetime.datetime(2019, 10, 3, 18)
+    df = tickstore.select_many(symbols, start, end, columns=['A'], layout=layout)
+    selects = {symbol: tickstore.select(symbol, start, end, columns=['A']) for symbol in symbols}
+    long = pd.concat(selects.values(), keys=symbols, names=['symbol']).reorder_levels([ts_col_name, 'symbol'])
+    long = long.iloc[np.argsort(long.index.get_level_values(ts_col_name).values, kind='mergesort')]
+    if layout == 'long':
+        assert long.equals(df)
+    else:
+        # the same as aligning every symbol to all timestamps with merge_asof
+        timestamps = pd.DataFrame(index=long.index.get_level_values(ts_col_name).unique())
+        for symbol in symbols:
+            aligned = pd.merge_asof(timestamps, selects[symbol], left_index=True, right_index=True)
+            assert np.allclose(aligned['A'].values, df[(symbol, 'A')].values, equal_nan=True)
+        assert list(timestamps.index) == list(df.index)
+    assert tickstore.select_many(['XRP-USD'], start, end, layout=layout).empty
+
+    # fewer workers than symbols still reads every symbol
+    assert df.equals(tickstore.select_many(symbols, start, end, columns=['A'], layout=layout, workers=1))
+
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_index_log():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    index_path = Path('./COINBASE_PRO_TRADES/index.h5')
+    log_path = Path('./COINBASE_PRO_TRADES/index.log')
+    index_mtime = index_path.stat().st_mtime_ns
+
+    # inserts only get appended to the log
+    for i in range(5):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), random_ticks(ts_col_name))
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 2)))
+    tickstore.close()
+    assert index_mtime == index_path.stat().st_mtime_ns
+    assert 8 == len(log_path.read_text().splitlines())
+
+    # replayed on open, ignoring a torn entry at the end
+    with log_path.open(mode='a') as log_file:
+        log_file.write('{"op": "end", "sym')
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    df = tickstore.index.select('BTC-USD', datetime.date(2019, 10, 1), datetime.date(2019, 10, 31),
+                                BiTimestamp.latest_as_of)
+    assert 4 == len(df)
+    assert [1, 0, 0, 0] == list(df.sort_index().index.get_level_values('version'))
+
+    # only a writer can tell the entry is torn rather than still being appended, so cuts it off
+    tickstore.index.checkpoint_interval = 9
+    tickstore.insert('ETH-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    assert 9 == len(log_path.read_text().splitlines())
+    assert log_path.read_text().endswith('}\n')
+
+    # checkpointing folds the log back into the index
+    tickstore.close()
+    assert not log_path.exists()
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    df = tickstore.index.select('BTC-USD', datetime.date(2019, 10, 1), datetime.date(2019, 10, 31),
+                                BiTimestamp.latest_as_of)
+    assert 4 == len(df)
+    df = tickstore.index.select('ETH-USD', datetime.date(2019, 10, 1), datetime.date(2019, 10, 31),
+                                BiTimestamp.latest_as_of)
+    assert 1 == len(df)
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_concurrent_writers():
+    ts_col_name = 'ts'
+    LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name).close()
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(insert_versions, range(4)))
+
+    # every writer's versions made it in, numbered without gaps or collisions
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    versions = tickstore.index.get_versions('BTC-USD', datetime.date(2019, 10, 1))
+    assert list(range(20)) == [splay_version.version for splay_version in versions]
+    assert 1 == len([splay_version for splay_version in versions if
+                     splay_version.is_valid(BiTimestamp.latest_as_of)])
+    assert all(Path(splay_version.path).exists() for splay_version in versions)
+    for worker in range(4):
+        assert 5 == len(tickstore.index.get_versions(f'SYM{worker}', datetime.date(2019, 10, 1)))
+    assert [] == list(Path('./COINBASE_PRO_TRADES/2019/10/01').glob('*.tmp'))
+    tickstore.reindex()
+    assert 20 == len(tickstore.index.get_versions('BTC-USD', datetime.date(2019, 10, 1)))
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_reload_after_checkpoint():
+    ts_col_name = 'ts'
+    writer1 = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    writer2 = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    writer1.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    writer1.index.checkpoint()
+
+    # the second writer reloads the checkpointed index, version 0 starting at the start of time included
+    writer2.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    versions = writer2.index.get_versions('BTC-USD', datetime.date(2019, 10, 1))
+    assert [0, 1] == [splay_version.version for splay_version in versions]
+    assert BiTimestamp.start_as_of == versions[0].start_time
+    writer1.close()
+    writer2.close()
+    writer2.destroy()
+
+
+def test_tickstore_read_without_lock():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    tickstore.close()
+
+    def read():
+        reader = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+        ticks = reader.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31))
+        reader.close()
+        return ticks
+
+    # reading does not create the lock file, which would need write access
+    Path('./COINBASE_PRO_TRADES/index.lock').unlink()
+    assert 100 == len(read())
+    assert not Path('./COINBASE_PRO_TRADES/index.lock').exists()
+
+    # nor does it wait for a writer holding the lock
+    writer = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with writer.index.lock:
+            assert 100 == len(executor.submit(read).result(timeout=30))
+    writer.close()
+    writer.destroy()
+
+
+def insert_versions(worker):
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    tickstore.index.checkpoint_interval = 7
+    for i in range(5):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+        tickstore.insert(f'SYM{worker}', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+        tickstore.flush()
+    tickstore.close()
+
+
+def test_tickstore_bitemporal():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    start = datetime.datetime(2019, 10, 1)
+    end = datetime.datetime(2019, 10, 2)
+
+    v0 = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), v0)
+    v1 = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), v1)
+    v1_start = tickstore.index.select('BTC-USD', start, end, BiTimestamp.latest_as_of)['start_time'].iloc[0]
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)))
+    deleted = datetime.datetime.utcnow()
+
+    for _ in range(2):
+        before_v1 = v1_start - datetime.timedelta(microseconds=1)
+        after_v1 = v1_start + datetime.timedelta(microseconds=1)
+        assert v0['A'].sum() == tickstore.select('BTC-USD', start, end, as_of_time=before_v1)['A'].sum()
+        assert v1['A'].sum() == tickstore.select('BTC-USD', start, end, as_of_time=after_v1)['A'].sum()
+        assert tickstore.select('BTC-USD', start, end, as_of_time=deleted).empty
+        assert tickstore.select('ETH-USD', start, end).empty
+
+        # same again after a round trip through the HDF5 index
+        tickstore.index.checkpoint()
+        tickstore.close()
+        tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+        assert ['symbol', 'date', 'version'] == tickstore.index.df.index.names
+        assert ['start_time', 'end_time', 'path'] == list(tickstore.index.df.columns)
+
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_incremental_reindex():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    for i in range(3):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), random_ticks(ts_col_name))
+    tickstore.reindex()
+
+    # the logical delete is not recorded in the files, so only survives if the date does not get rescanned
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)))
+    shutil.rmtree('./COINBASE_PRO_TRADES/2019/10/02')
+    Path('./COINBASE_PRO_TRADES/2019/11/01').mkdir(parents=True)
+    shutil.copy('./COINBASE_PRO_TRADES/2019/10/03/BTC-USD_0000.h5', './COINBASE_PRO_TRADES/2019/11/01/ETH-USD_0000.h5')
+    tickstore.reindex(incremental=True)
+
+    def select_dates(symbol):
+        df = tickstore.index.select(symbol, datetime.date(2019, 10, 1), datetime.date(2019, 11, 30),
+                                    BiTimestamp.latest_as_of)
+        return [date.date() for date in df.index.get_level_values('date')]
+
+    assert [datetime.date(2019, 10, 3)] == select_dates('BTC-USD')
+    assert [datetime.date(2019, 11, 1)] == select_dates('ETH-USD')
+    tickstore.close()
+
+    # a full reindex brings back the deleted splay
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    assert [datetime.date(2019, 10, 3)] == select_dates('BTC-USD')
+    tickstore.reindex()
+    assert [datetime.date(2019, 10, 1), datetime.date(2019, 10, 3)] == select_dates('BTC-USD')
+    tickstore.close()
+    tickstore.destroy()
+
+
+def test_tickstore_splay_cache():
+    ts_col_name = 'ts'
+    splay_cache = SplayCache()
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name, splay_cache=splay_cache)
+    v0 = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), v0)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 2)), random_ticks(ts_col_name))
+
+    start = datetime.datetime(2019, 10, 1)
+    end = datetime.datetime(2019, 10, 1, 12)
+    df = tickstore.select('BTC-USD', start, end, columns=['A'])
+    assert (0, 1) == (splay_cache.hits, splay_cache.misses)
+    assert 1 == len(splay_cache)
+
+    # served from the cache, including for different columns and time ranges
+    assert df.equals(tickstore.select('BTC-USD', start, end, columns=['A']))
+    df = tickstore.select('BTC-USD', start, datetime.datetime(2019, 10, 1, 23, 59, 59))
+    assert (2, 1) == (splay_cache.hits, splay_cache.misses)
+    assert v0['B'].sort_values().tolist() == df['B'].sort_values().tolist()
+
+    # a new version supersedes the cached one
+    v1 = random_ticks(ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), v1)
+    assert 0 == len(splay_cache)
+    df = tickstore.select('BTC-USD', start, datetime.datetime(2019, 10, 1, 23, 59, 59))
+    assert v1['B'].sort_values().tolist() == df['B'].sort_values().tolist()
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)))
+    assert 0 == len(splay_cache)
+
+    tickstore.select('BTC-USD', datetime.datetime(2019, 10, 2), datetime.datetime(2019, 10, 3))
+    assert 1 == len(splay_cache)
+    tickstore.close()
+    tickstore.destroy()
+    assert 0 == len(splay_cache)
+
+
+def test_azure_blob_tickstore():
+    ts_col_name = 'ts'
+    container = DirectoryBlobContainer(Path('./COINBASE_PRO_TRADES_BLOB'))
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name,
+                                   chunk_size=1024)
+    assert_empty(tickstore)
+    for i in range(5):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), random_ticks(ts_col_name))
+    expected = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31))
+    assert len(expected) == 500
+    tickstore.close()
+    assert 'index.h5' in container.list_blobs()
+    assert 5 == len(container.list_blobs('2019/10/'))
+
+    # a cold cache in another directory gets filled from the blob container
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES_CACHE'), timestamp_column=ts_col_name)
+    df = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31))
+    assert expected.equals(df)
+    assert 5 == len(list(Path('./COINBASE_PRO_TRADES_CACHE/2019/10').iterdir()))
+
+    # new versions and deletes are written back on close
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 2)))
+    tickstore.close()
+    shutil.rmtree('./COINBASE_PRO_TRADES')
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    df = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 2, 23, 59, 59))
+    assert 100 == len(df)
+    assert not expected.loc[:datetime.datetime(2019, 10, 1, 23, 59, 59)].equals(df)
+
+    tickstore.close()
+    tickstore.destroy()
+    assert [] == container.list_blobs()
+    shutil.rmtree('./COINBASE_PRO_TRADES_BLOB')
+    shutil.rmtree('./COINBASE_PRO_TRADES_CACHE')
+
+
+def test_azure_blob_tickstore_new_container():
+    ts_col_name = 'ts'
+    tickstore = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    tickstore.close()
+    Path('./COINBASE_PRO_TRADES/notes.txt').write_text('not a splay')
+
+    # stale splays and index files get cleared from the cache, but nothing else
+    container = DirectoryBlobContainer(Path('./COINBASE_PRO_TRADES_BLOB'))
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    assert_empty(tickstore)
+    assert not Path('./COINBASE_PRO_TRADES/2019').exists()
+    assert 'not a splay' == Path('./COINBASE_PRO_TRADES/notes.txt').read_text()
+    tickstore.close()
+    tickstore.destroy()
+    shutil.rmtree('./COINBASE_PRO_TRADES_BLOB')
+
+
+def test_azure_blob_tickstore_reindex():
+    ts_col_name = 'ts'
+    container = DirectoryBlobContainer(Path('./COINBASE_PRO_TRADES_BLOB'))
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    for i in range(3):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), random_ticks(ts_col_name))
+    tickstore.flush()
+    time.sleep(0.01)
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    tickstore.insert('ETH-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    expected = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31))
+    tickstore.close()
+
+    # rebuilt from the container, even though this cache holds none of the splays
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES_CACHE'), timestamp_column=ts_col_name)
+    tickstore.reindex()
+    assert 2 == len(tickstore.index.get_versions('BTC-USD', datetime.date(2019, 10, 1)))
+    df = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31))
+    assert expected.equals(df)
+    assert 100 == len(tickstore.select('ETH-USD', datetime.datetime(2019, 10, 1), datetime.datetime(2019, 10, 31)))
+    tickstore.close()
+
+    # and the rebuilt index got written back
+    tickstore = AzureBlobTickstore(container, Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    assert expected.equals(tickstore.select('BTC-USD', datetime.datetime(2019, 10, 1),
+                                            datetime.datetime(2019, 10, 31)))
+    tickstore.close()
+    tickstore.destroy()
+    shutil.rmtree('./COINBASE_PRO_TRADES_BLOB')
+    shutil.rmtree('./COINBASE_PRO_TRADES_CACHE')
+
+
+def test_tiered_tickstore():
+    ts_col_name = 'ts'
+    hot = LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name)
+    cold = LocalTickstore(Path('./COINBASE_PRO_TRADES_ARCHIVE'), timestamp_column=ts_col_name)
+    tickstore = TieredTickstore(hot, cold, hot_days=365 * 100)
+    for i in range(4):
+        tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, i + 1)), random_ticks(ts_col_name))
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 1)), random_ticks(ts_col_name))
+    v1_start = hot.index.get_versions('BTC-USD', datetime.date(2019, 10, 1))[1].start_time
+    tickstore.delete('BTC-USD', BiTimestamp(datetime.date(2019, 10, 4)))
+
+    start = datetime.datetime(2019, 10, 1)
+    end = datetime.datetime(2019, 10, 31)
+    as_of_v0 = v1_start - datetime.timedelta(microseconds=1)
+    expected = tickstore.select('BTC-USD', start, end)
+    expected_v0 = tickstore.select('BTC-USD', start, end, as_of_time=as_of_v0)
+    assert 300 == len(expected)
+
+    # move the first two days into the archive, versions and all
+    assert 2 == tickstore.migrate(datetime.date(2019, 10, 3))
+    assert [datetime.date(2019, 10, 3), datetime.date(2019, 10, 4)] == hot.index.symbols['BTC-USD'].dates
+    assert [datetime.date(2019, 10, 1), datetime.date(2019, 10, 2)] == cold.index.symbols['BTC-USD'].dates
+    assert not Path('./COINBASE_PRO_TRADES/2019/10/01').exists() or \
+        0 == len(list(Path('./COINBASE_PRO_TRADES/2019/10/01').iterdir()))
+    assert expected.equals(tickstore.select('BTC-USD', start, end))
+    assert expected_v0.equals(tickstore.select('BTC-USD', start, end, as_of_time=as_of_v0))
+    assert 0 == tickstore.migrate(datetime.date(2019, 10, 3))
+
+    # or just some of the dates, from whichever tier has them; random_ticks() stamps every date's ticks on the
+    # first, so this also checks ticks are picked by the date they're stored under rather than their time
+    dates = [datetime.date(2019, 10, 2), datetime.date(2019, 10, 3)]
+    df = tickstore.select_dates('BTC-USD', dates, start, end)
+    assert 200 == len(df)
+    assert df.index.is_monotonic_increasing
+    tiers = pd.concat([cold.select_dates('BTC-USD', dates, start, end), hot.select_dates('BTC-USD', dates, start, end)])
+    assert 200 == len(tiers)
+    assert sorted(tiers['A'].tolist()) == sorted(df['A'].tolist())
+
+    # a date left in both tiers is served from the hot one
+    tickstore.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 2)), random_ticks(ts_col_name))
+    cold.import_versions('BTC-USD', datetime.date(2019, 10, 3),
+                         hot.export_versions('BTC-USD', datetime.date(2019, 10, 3)))
+    hot.insert('BTC-USD', BiTimestamp(datetime.date(2019, 10, 3)), random_ticks(ts_col_name))
+    day3 = hot.select('BTC-USD', datetime.datetime(2019, 10, 3), datetime.datetime(2019, 10, 3, 23, 59, 59))
+    df = tickstore.select('BTC-USD', datetime.datetime(2019, 10, 3), datetime.datetime(2019, 10, 3, 23, 59, 59))
+    assert day3.equals(df)
+
+    # and the archive survives reopening
+    tickstore.close()
+    cold = LocalTickstore(Path('./COINBASE_PRO_TRADES_ARCHIVE'), timestamp_column=ts_col_name)
+    assert 2 == len(cold.index.get_versions('BTC-USD', datetime.date(2019, 10, 2)))
+    tickstore = TieredTickstore(LocalTickstore(Path('./COINBASE_PRO_TRADES'), timestamp_column=ts_col_name), cold)
+    tickstore.start_migration()
+    for _ in range(100):
+        if 'BTC-USD' not in tickstore.hot.index.symbols:
+            break
+        time.sleep(0.1)
+    tickstore.close()
+    assert 'BTC-USD' not in tickstore.hot.index.symbols
+    assert 4 == len(cold.index.symbols['BTC-USD'].dates)
+    tickstore.destroy()
+
+
 def assert_empty(tickstore):
     df = tickstore.select('BTC-USD', start=datetime.datetime(2019, 10, 1), end=datetime.datetime(2019, 10, 31))
     assert df.size == 0
 
 
+def random_ticks(ts_col_name):
+    ts_index = random_dates(pd.to_datetime('2019-10-1'), pd.to_datetime('2019-10-2'), 100)
+    ts_index.name = ts_col_name
+    return pd.DataFrame(np.random.randint(0, 100, size=(100, 4)), columns=list('ABCD'), index=ts_index)
+
+
 def random_dates(start, end, n):
     start_u = start.value//10**9
     end_u = end.value//10**9
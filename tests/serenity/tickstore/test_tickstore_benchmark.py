@@ -0,0 +1,37 @@
+import datetime
+import json
+import shutil
+
+import pandas as pd
+
+from serenity.tickstore.tickstore_benchmark import compare_results, generate_trades, run_benchmarks
+from pathlib import Path
+
+
+def test_generate_trades():
+    trades = generate_trades('BTC-USD', datetime.date(2019, 10, 1), 10000, seed=1)
+    assert 9000 < len(trades) < 11000
+    assert trades.index.is_monotonic_increasing
+    assert trades.index[0] >= pd.Timestamp('2019-10-01')
+    assert trades.index[-1] < pd.Timestamp('2019-10-02')
+    assert (trades['price'] > 0).all() and (trades['size'] > 0).all()
+    assert trades.equals(generate_trades('BTC-USD', datetime.date(2019, 10, 1), 10000, seed=1))
+
+
+def test_run_benchmarks():
+    output = Path('tmp/benchmark.json')
+    run_benchmarks(output, Path('tmp'), ['hdf5', 'parquet'], symbols=2, days=2, trades_per_day=1000, repeat=1)
+    results = json.loads(output.read_text())['results']
+    benchmarks = {(result['benchmark'], result['splay_format']) for result in results}
+    for splay_format in ['hdf5', 'parquet']:
+        for benchmark in ['insert', 'select_1h', 'select_1h_price', 'select_1d', 'select_1d_price', 'index_open_log',
+                          'index_flush', 'index_checkpoint', 'index_open', 'reindex', 'reindex_incremental']:
+            assert (benchmark, splay_format) in benchmarks
+    assert not Path('tmp/BENCHMARK_HDF5').exists()
+
+    comparison = compare_results(output, output)
+    assert (comparison['ratio'] == 1.0).all()
+
+
+def teardown_function():
+    shutil.rmtree('tmp', ignore_errors=True)